@@ -4,16 +4,24 @@ import aiohttp
 import json
 import os
 import logging
+import logging.handlers
+import queue
+import atexit
+import signal
 import uuid
+import itertools
+import heapq
 import time
 import requests
 import re
+import random
+import sqlite3
 from enum import Enum
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from discord.ext import commands
 from discord.ext.commands import has_permissions
 from discord.ui import Button, View
-from cachetools import TTLCache
-from datetime import datetime, timedelta
 from aiohttp_retry import RetryClient, ExponentialRetry
 
 # -------------------------------------------------------------------------
@@ -21,93 +29,1545 @@ from aiohttp_retry import RetryClient, ExponentialRetry
 # -------------------------------------------------------------------------
 
 # Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = int(os.environ.get("LOG_SAMPLE_RATE", 50))  # Log one in every N per-message events
 
-# Create a dictionary with a 24-hour expiration (in seconds)
-relayed_text_messages = TTLCache(maxsize=10000, ttl=24 * 60 * 60)  # Max size, TTL, and 24-hour expiration
+def setup_logging():
+    """
+    Route all log records through a queue so handler I/O runs on a background thread
+    instead of blocking the event loop.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    root_logger = logging.getLogger()
+    root_logger.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(LOG_LEVEL)
+
+    listener.start()
+    atexit.register(listener.stop)  # Flush queued records on exit
+    return listener
+
+setup_logging()
+
+# Relay work queue priority classes (lower values are served first)
+PRIORITY_LFG_UPDATE = 0  # LFG embed updates and relay deletions
+PRIORITY_CHAT = 1  # New chat relays and edits
+PRIORITY_REACTION = 2  # Reaction mirrors
 
-# Set up global rate limit handling
-RATE_LIMIT_DELAY = 0.5  # Default delay between API calls to prevent spamming
+# Relay work queue sizing
+RELAY_WORKERS = int(os.environ.get("RELAY_WORKERS", 8))
+RELAY_QUEUE_MAXSIZE = int(os.environ.get("RELAY_QUEUE_MAXSIZE", 2000))
+RELAY_QUEUE_HIGH_WATER = int(os.environ.get("RELAY_QUEUE_HIGH_WATER", 500))  # Reactions are shed above this depth
 
-message_map = {}
+# Maximum number of relay sends in flight across all destination channels
+RELAY_MAX_CONCURRENCY = int(os.environ.get("RELAY_MAX_CONCURRENCY", 16))
+
+# Time (in seconds) reaction events are buffered per (message, emoji) before being mirrored
+REACTION_COALESCE_WINDOW = float(os.environ.get("REACTION_COALESCE_WINDOW", 1.5))
+
+# Outbound DM limits
+DM_COOLDOWN = float(os.environ.get("DM_COOLDOWN", 10 * 60))  # Repeated notices of the same kind within this window are collapsed
+DM_MAX_CONCURRENCY = int(os.environ.get("DM_MAX_CONCURRENCY", 8))
+
+# Relay map bounds (entries older than the TTL or beyond the max size are evicted)
+RELAY_MAP_MAX_ENTRIES = int(os.environ.get("RELAY_MAP_MAX_ENTRIES", 10000))
+RELAY_MAP_TTL = int(os.environ.get("RELAY_MAP_TTL", 24 * 60 * 60))  # 24 hours
+RELAY_DELETED_TTL = int(os.environ.get("RELAY_DELETED_TTL", 10 * 60))  # Deleted originals are remembered this long so late copies are removed
+RELAY_STORE_RETENTION = int(os.environ.get("RELAY_STORE_RETENTION", 7 * 24 * 60 * 60))  # On-disk relay history is kept for 7 days
 
 global_aiohttp_session = None  # Initialize the global session
 
+# Relay mode: "gateway" sends copies as the bot, "webhook" sends them through each channel's webhook
+RELAY_MODE = os.environ.get("RELAY_MODE", "gateway").lower()
+RELAY_ALLOWED_MENTIONS = {"parse": ["users"]}  # Relayed webhook posts never ping @everyone, @here or roles
+
+# Pooled HTTP session limits
+HTTP_CONNECTION_LIMIT = int(os.environ.get("HTTP_CONNECTION_LIMIT", 50))
+HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 15))  # Seconds per request
+
 # BigLFG Embed Tracking
 active_embeds = {}  # Independently managed
+lfg_message_index = {}  # Message ID of every LFG embed copy -> lfg_uuid
+lfg_flush_pending = set()  # LFG UUIDs with a coalesced embed update scheduled
+LFG_UPDATE_WINDOW = float(os.environ.get("LFG_UPDATE_WINDOW", 0.5))  # Seconds JOIN/LEAVE clicks are coalesced per LFG
+LFG_TIMEOUT = 45 * 60  # LFG requests time out after 45 minutes
+
+# Pre-created TableStream rooms, handed out instantly when a game fills up
+TABLESTREAM_ROOM_TTL = 60 * 60  # initialScheduleTTLInSeconds of every created room
+TABLESTREAM_POOL_SIZE = int(os.environ.get("TABLESTREAM_POOL_SIZE", 2))  # 0 disables the pool
+TABLESTREAM_POOL_MARGIN = int(os.environ.get("TABLESTREAM_POOL_MARGIN", 20 * 60))  # Pooled rooms are retired this long before their TTL ends
+
+# TableStream API client limits
+TABLESTREAM_API_URL = "https://api.table-stream.com/create-room"
+TABLESTREAM_TIMEOUT = float(os.environ.get("TABLESTREAM_TIMEOUT", 10))  # Seconds per attempt
+TABLESTREAM_ATTEMPTS = int(os.environ.get("TABLESTREAM_ATTEMPTS", 3))
+TABLESTREAM_BREAKER_THRESHOLD = int(os.environ.get("TABLESTREAM_BREAKER_THRESHOLD", 5))  # Consecutive failures that open the breaker
+TABLESTREAM_BREAKER_COOLDOWN = float(os.environ.get("TABLESTREAM_BREAKER_COOLDOWN", 60))  # Seconds before a trial call is let through
 
 # Access the token from the environment variable
 TOKEN = os.environ.get('TOKEN')
 
-# Persistent storage paths
+# Persistent storage paths (the JSON files are imported into the database on first run)
 PERSISTENT_DATA_PATH = '/var/data/webhooks.json'
 CHANNEL_FILTERS_PATH = '/var/data/channel_filters.json'
 BANNED_USERS_PATH = "/var/data/banned_users.json"
 TRUSTED_ADMINS_PATH = "/var/data/trusted_admins.json"
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "/var/data/bot_database.db")
+PERSIST_DELAY = float(os.environ.get("PERSIST_DELAY", 1.0))  # Seconds state changes are coalesced before being written
 
 # Add the IMAGE_URL variable here
 IMAGE_URL = "https://raw.githubusercontent.com/TryhardClay/PDH-LFG-Bot/main/PDHBot.jpg"
 
+# Define default super admins (always trusted)
+DEFAULT_SUPER_ADMINS = [582548598584115211, 115375818938646531]
+
 # Define banned servers (hardcoded initial value)
 banned_servers = {1136731758281363626, 1336809851451609169}
 
-# Define RateLimiter Class
-class RateLimiter:
-    def __init__(self, max_requests: int, period: float):
-        """
-        Initialize a rate limiter.
-        :param max_requests: Maximum number of requests allowed.
-        :param period: Time period (in seconds) for the rate limit.
-        """
-        self.max_requests = max_requests
-        self.period = period
-        self.requests = asyncio.Queue()
-        self.lock = asyncio.Lock()
-
-    async def acquire(self):
-        async with self.lock:
-            now = datetime.now()
-            while not self.requests.empty():
-                if (now - self.requests.queue[0]).total_seconds() > self.period:
-                    await self.requests.get()
-                else:
+# Define LogSampler Class
+class LogSampler:
+    def __init__(self, rate: int):
+        """
+        Initialize a log sampler for high-volume, per-message events.
+        :param rate: Log one in every `rate` events per category (all of them when DEBUG is enabled).
+        """
+        self.rate = max(rate, 1)
+        self.counts = {}
+
+    def log(self, category, level, msg, *args):
+        """
+        Log a per-message event lazily, sampled by category.
+        """
+        root_logger = logging.getLogger()
+        if not root_logger.isEnabledFor(level):
+            return
+        count = self.counts.get(category, 0)
+        self.counts[category] = count + 1
+        if root_logger.isEnabledFor(logging.DEBUG):
+            logging.log(level, msg, *args)
+        elif count % self.rate == 0:
+            logging.log(level, msg + " [sampled 1/%d]", *args, self.rate)
+
+# Define RateLimitScheduler Class
+class RateLimitScheduler:
+    def __init__(self, violation_threshold: int, violation_window: float, backoff_duration: float):
+        """
+        Initialize the rate limit scheduler for webhook requests.
+        Tracks Discord's per-webhook buckets from X-RateLimit-* headers and gates all webhook senders
+        behind a global backoff when 429 responses cluster.
+        Gateway calls are left to discord.py, whose HTTP client handles their buckets and 429s internally.
+        :param violation_threshold: Number of 429 responses within the window that triggers a global backoff.
+        :param violation_window: Time window (in seconds) for counting 429 responses.
+        :param backoff_duration: Minimum duration (in seconds) of a global backoff.
+        """
+        self.violation_threshold = violation_threshold
+        self.violation_window = violation_window
+        self.backoff_duration = backoff_duration
+        self.routes = {}  # route key -> Discord bucket hash (several routes may share a bucket)
+        self.buckets = {}  # bucket key -> {"limit", "remaining", "reset_at", "reset_after"}
+        self.violations = deque()  # Timestamps of recent 429 responses
+        self.global_resume_at = 0.0
+        self.total_wait = 0.0  # Seconds spent waiting pre-emptively, for monitoring
+
+    def _bucket(self, route):
+        return self.buckets.get(self.routes.get(route, route))
+
+    def wait_time(self, route):
+        """
+        Return how long (in seconds) a request on the given route should wait before being sent.
+        """
+        now = time.monotonic()
+        wait = self.global_resume_at - now
+        bucket = self._bucket(route)
+        if bucket and bucket["remaining"] <= 0:
+            wait = max(wait, bucket["reset_at"] - now)
+        return max(wait, 0.0)
+
+    async def acquire(self, route):
+        """
+        Wait until a request on the given route can be sent, then reserve a slot in its bucket.
+        """
+        while True:
+            wait = self.wait_time(route)
+            if wait <= 0:
+                break
+            logging.debug("Pre-emptively waiting %.2f seconds for rate limit on route %s.", wait, route)
+            self.total_wait += wait
+            await asyncio.sleep(wait)
+
+        bucket = self._bucket(route)
+        if bucket:
+            now = time.monotonic()
+            if bucket["reset_at"] <= now:
+                # The bucket has reset since the last response; assume a full window until headers say otherwise
+                bucket["remaining"] = bucket["limit"]
+                bucket["reset_at"] = now + bucket["reset_after"]
+            bucket["remaining"] -= 1
+
+    def update(self, route, headers, status=None):
+        """
+        Update bucket state from the X-RateLimit-* headers of a response on the given route.
+        """
+        try:
+            bucket_hash = headers.get("X-RateLimit-Bucket")
+            bucket_key = bucket_hash or route
+            if bucket_hash:
+                self.routes[route] = bucket_hash
+
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            if remaining is not None and reset_after is not None:
+                reset_after = float(reset_after)
+                self.buckets[bucket_key] = {
+                    "limit": int(headers.get("X-RateLimit-Limit", int(remaining) + 1)),
+                    "remaining": int(remaining),
+                    "reset_at": time.monotonic() + reset_after,
+                    "reset_after": reset_after,
+                }
+
+            if status == 429:
+                retry_after = float(headers.get("Retry-After", reset_after or 1))
+                is_global = headers.get("X-RateLimit-Global") == "true" or headers.get("X-RateLimit-Scope") == "global"
+                bucket = self.buckets.setdefault(bucket_key, {"limit": 1, "remaining": 0, "reset_at": 0.0, "reset_after": retry_after})
+                bucket["remaining"] = 0
+                bucket["reset_at"] = time.monotonic() + retry_after
+                self.record_violation(retry_after, is_global)
+        except (TypeError, ValueError) as e:
+            logging.error(f"Invalid rate limit headers for route {route}: {e}")
+
+    def record_violation(self, retry_after=0.0, is_global=False):
+        """
+        Record a 429 response and engage the global backoff if they are clustering.
+        """
+        now = time.monotonic()
+        self.violations.append(now)
+        while self.violations and now - self.violations[0] > self.violation_window:
+            self.violations.popleft()
+
+        if is_global or len(self.violations) >= self.violation_threshold:
+            resume_at = now + max(retry_after, self.backoff_duration)
+            if resume_at > self.global_resume_at:
+                self.global_resume_at = resume_at
+                logging.critical(f"Too many rate limit violations! Pausing all senders for {resume_at - now:.2f} seconds.")
+            self.violations.clear()
+
+# Define RelayQueue Class
+class RelayQueue:
+    def __init__(self, maxsize: int, high_water: int):
+        """
+        Initialize the relay work queue.
+        Jobs are served by priority class, then in submission order within a class.
+        :param maxsize: Maximum queue depth; submitters wait for room beyond it.
+        :param high_water: Depth above which reaction jobs are dropped instead of queued.
+        """
+        self.maxsize = maxsize
+        self.high_water = high_water
+        self.queue = None  # Created lazily inside the running event loop
+        self.sequence = itertools.count()
+        self.shed_jobs = 0
+
+    def _get_queue(self):
+        if self.queue is None:
+            self.queue = asyncio.PriorityQueue(maxsize=self.maxsize)
+        return self.queue
+
+    def depth(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def submit(self, priority, job, description):
+        """
+        Queue a relay job.
+        Returns immediately unless the queue is full, in which case the caller waits for room (backpressure).
+        :param priority: One of the PRIORITY_* classes.
+        :param job: Zero-argument coroutine function performing the work.
+        :param description: Short label used in log messages.
+        :return: False if the job was shed, True otherwise.
+        """
+        queue = self._get_queue()
+        if priority >= PRIORITY_REACTION and queue.qsize() >= self.high_water:
+            self.shed_jobs += 1
+            log_sampler.log("shed", logging.WARNING, "Relay queue depth %d above high water mark. Dropping %s.", queue.qsize(), description)
+            return False
+
+        item = (priority, next(self.sequence), job, description)
+        if queue.full():
+            logging.warning(f"Relay queue full ({queue.qsize()} jobs). Waiting to queue {description}.")
+            await queue.put(item)
+        else:
+            queue.put_nowait(item)
+        return True
+
+    async def get(self):
+        return await self._get_queue().get()
+
+    def task_done(self):
+        self.queue.task_done()
+
+# Define ReactionCoalescer Class
+class ReactionCoalescer:
+    def __init__(self, window: float, flush):
+        """
+        Initialize the reaction mirroring coalescer.
+        Reaction events are buffered per (original message, emoji); once the window closes, only the
+        difference between the desired mirrored state and what the bot has already placed is sent.
+        :param window: Time (in seconds) events are buffered before flushing.
+        :param flush: Coroutine function called as flush(original_id, emoji_key) when the window closes.
+        """
+        self.window = window
+        self.flush = flush
+        self.native = {}  # key -> {message_id: set of user IDs reacting on that message}
+        self.placed = {}  # key -> set of message IDs carrying the bot's mirrored reaction
+        self.emojis = {}  # key -> emoji used for API calls
+        self.by_origin = {}  # original_id -> set of keys
+        self.pending = set()  # Keys with a flush scheduled
+        self.events = 0
+        self.flushes = 0
+
+    def record(self, original_id, emoji, message_id, user_id, added):
+        """
+        Buffer a reaction add or removal made by a user on a message in a relay group.
+        """
+        key = (original_id, str(emoji))
+        self.emojis[key] = emoji
+        self.by_origin.setdefault(original_id, set()).add(key)
+        reactors = self.native.setdefault(key, {}).setdefault(str(message_id), set())
+        if added:
+            reactors.add(user_id)
+        else:
+            reactors.discard(user_id)
+
+        self.events += 1
+        if key not in self.pending:
+            self.pending.add(key)
+            asyncio.create_task(self._flush_later(key))
+
+    async def _flush_later(self, key):
+        await asyncio.sleep(self.window)
+        self.pending.discard(key)
+        self.flushes += 1
+        try:
+            await self.flush(*key)
+        except Exception as e:
+            logging.error(f"Error flushing reactions for message ID {key[0]}: {e}")
+
+    def plan(self, key, group_message_ids):
+        """
+        Compare the desired mirrored state of a relay group with what the bot has already placed.
+        Returns a tuple of (message IDs to add the reaction to, message IDs to remove it from).
+        """
+        reacted_on = {message_id for message_id, users in self.native.get(key, {}).items() if users}
+        placed = self.placed.get(key, set())
+        adds, removes = [], []
+        for message_id in group_message_ids:
+            # A copy needs the bot's reaction while someone has reacted on a different copy
+            desired = bool(reacted_on - {message_id})
+            if desired and message_id not in placed:
+                adds.append(message_id)
+            elif not desired and message_id in placed:
+                removes.append(message_id)
+        return adds, removes
+
+    def mark(self, key, message_id, placed):
+        """
+        Record that the bot's reaction was placed on (or removed from) a message.
+        """
+        if placed:
+            self.placed.setdefault(key, set()).add(message_id)
+        else:
+            self.placed.get(key, set()).discard(message_id)
+
+    def restore(self, original_id, reactions):
+        """
+        Load the bot's mirrored reactions for a relay group, e.g. from the relay store after a restart.
+        :param reactions: Mapping of emoji key -> message IDs carrying the bot's reaction.
+        """
+        for emoji_key, message_ids in reactions.items():
+            key = (original_id, emoji_key)
+            self.placed.setdefault(key, set()).update(message_ids)
+            self.by_origin.setdefault(original_id, set()).add(key)
+
+    def prune(self, key):
+        """
+        Drop a key once nobody reacts with it and the bot has nothing placed.
+        """
+        if key in self.pending or self.placed.get(key):
+            return
+        if any(self.native.get(key, {}).values()):
+            return
+        self.native.pop(key, None)
+        self.placed.pop(key, None)
+        self.emojis.pop(key, None)
+        keys = self.by_origin.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_origin[key[0]]
+
+    def forget(self, original_id):
+        """
+        Drop all reaction state for a relay group, e.g. when it is evicted or deleted.
+        """
+        for key in self.by_origin.pop(original_id, set()):
+            self.native.pop(key, None)
+            self.placed.pop(key, None)
+            self.emojis.pop(key, None)
+
+# Define DMDispatcher Class
+class DMDispatcher:
+    def __init__(self, bot, cooldown: float, max_concurrency: int, max_cached_channels: int = 5000):
+        """
+        Initialize the outbound DM dispatcher.
+        Users are resolved from the client cache before fetching, DM channels are reused,
+        and repeated DMs of the same kind to a user are collapsed within the cooldown.
+        :param bot: The Discord client.
+        :param cooldown: Time (in seconds) during which repeated DMs of the same kind are suppressed.
+        :param max_concurrency: Maximum number of DMs in flight.
+        :param max_cached_channels: Maximum number of DM channels kept for reuse.
+        """
+        self.bot = bot
+        self.cooldown = cooldown
+        self.max_concurrency = max_concurrency
+        self.max_cached_channels = max_cached_channels
+        self.semaphore = None  # Created lazily inside the running event loop
+        self.dm_channels = OrderedDict()  # user_id -> DMChannel, least recently used first
+        self.last_sent = {}  # (user_id, kind) -> monotonic time of the last DM
+        self.sent = 0
+        self.suppressed = 0
+
+    def _on_cooldown(self, user_id, kind):
+        now = time.monotonic()
+        if len(self.last_sent) > 10000:
+            self.last_sent = {key: sent_at for key, sent_at in self.last_sent.items() if now - sent_at < self.cooldown}
+        sent_at = self.last_sent.get((user_id, kind))
+        if sent_at is not None and now - sent_at < self.cooldown:
+            return True
+        self.last_sent[(user_id, kind)] = now  # Claimed before sending so concurrent duplicates collapse too
+        return False
+
+    async def _dm_channel(self, user_id, user=None):
+        channel = self.dm_channels.get(user_id)
+        if channel is not None:
+            self.dm_channels.move_to_end(user_id)
+            return channel
+
+        if user is None:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+        channel = user.dm_channel or await user.create_dm()
+
+        self.dm_channels[user_id] = channel
+        if len(self.dm_channels) > self.max_cached_channels:
+            self.dm_channels.popitem(last=False)
+        return channel
+
+    async def send(self, user_id, content, kind=None, user=None):
+        """
+        Send a DM to a user.
+        :param kind: Optional notice kind; a DM of the same kind sent within the cooldown is skipped.
+        :param user: Optional user object, saving the cache lookup.
+        :return: True if the DM was sent.
+        """
+        user_id = int(user_id)
+        if kind is not None and self._on_cooldown(user_id, kind):
+            self.suppressed += 1
+            return False
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            async with self.semaphore:
+                channel = await self._dm_channel(user_id, user)
+                await channel.send(content)
+            self.sent += 1
+            return True
+        except Exception as e:
+            logging.error(f"Failed to DM user {user_id}: {e}")
+            if kind is not None:
+                self.last_sent.pop((user_id, kind), None)  # Release the claim so the DM can be retried
+            return False
+
+    async def send_many(self, user_ids, content, kind=None):
+        """
+        Send the same DM to several users concurrently.
+        :return: Number of DMs sent.
+        """
+        results = await asyncio.gather(*[self.send(user_id, content, kind) for user_id in user_ids])
+        return sum(results)
+
+# Define DeadlineScheduler Class
+class DeadlineScheduler:
+    def __init__(self, on_expired):
+        """
+        Initialize a deadline scheduler backed by a single min-heap and one sweeper task.
+        Rescheduling or cancelling a key invalidates its heap entry, which is skipped when popped.
+        :param on_expired: Coroutine function called with the list of keys whose deadlines passed in one sweep.
+        """
+        self.on_expired = on_expired
+        self.heap = []  # (deadline, generation, key)
+        self.deadlines = {}  # key -> (deadline, generation) of the live entry
+        self.generation = itertools.count()
+        self.wakeup = None  # Created lazily inside the running event loop
+        self.task = None
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, deadline):
+        """
+        Schedule (or reschedule) a key to expire at a wall-clock timestamp, in O(log n).
+        Wall-clock deadlines can be stored and rescheduled after a restart.
+        """
+        entry = (deadline, next(self.generation))
+        self.deadlines[key] = entry
+        heapq.heappush(self.heap, (*entry, key))
+        if self.heap[0][2] == key and self.wakeup is not None:
+            self.wakeup.set()  # The sweeper may need to wake earlier
+
+    def cancel(self, key):
+        """
+        Cancel a key's deadline; its heap entry is discarded lazily.
+        """
+        self.deadlines.pop(key, None)
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            # Too many cancelled entries: rebuild the heap from the live deadlines
+            self.heap = [(*entry, key) for key, entry in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    def _pop_expired(self, now):
+        expired = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, generation, key = heapq.heappop(self.heap)
+            if self.deadlines.get(key) == (deadline, generation):
+                del self.deadlines[key]
+                expired.append(key)
+        return expired
+
+    async def _run(self):
+        while True:
+            expired = self._pop_expired(time.time())
+            if expired:
+                try:
+                    await self.on_expired(expired)
+                except Exception as e:
+                    logging.error(f"Error handling expired deadlines: {e}")
+                continue
+
+            self.wakeup.clear()
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+# Define WriteBehindStore Class
+class WriteBehindStore:
+    def __init__(self, delay: float, executor):
+        """
+        Initialize a write-behind persistence layer.
+        Callers only mark the keys they changed; changes within `delay` seconds are coalesced
+        and written by `executor`, so the event loop never waits on disk I/O.
+        :param delay: Time (in seconds) dirty keys are held before they are flushed.
+        :param executor: Single-thread executor the writes run on, in order.
+        """
+        self.delay = delay
+        self.executor = executor
+        self.sources = {}  # name -> (snapshot, write)
+        self.dirty = {}  # name -> keys changed since the last flush
+        self.flush_task = None
+
+    def register(self, name, snapshot, write):
+        """
+        Register a collection of persisted state.
+        :param snapshot: Called on the event loop with the dirty keys; returns the payload to write.
+        :param write: Called on the executor with that payload.
+        """
+        self.sources[name] = (snapshot, write)
+
+    def mark_dirty(self, name, key):
+        """
+        Record that `key` of collection `name` changed and schedule a coalesced flush.
+        """
+        self.dirty.setdefault(name, set()).add(key)
+        if self.flush_task is None or self.flush_task.done():
+            try:
+                self.flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+            except RuntimeError:
+                self.flush_sync()  # No event loop (startup or shutdown): write immediately
+
+    async def _flush_later(self):
+        # Keys marked while a write is running are picked up by the next pass
+        while True:
+            await asyncio.sleep(self.delay)
+            await self.flush()
+            if not self.dirty:
+                break
+
+    def _snapshot(self):
+        # Snapshot on the caller's thread so the writer never reads state that is being mutated
+        payloads = [(name, self.sources[name][1], self.sources[name][0](keys)) for name, keys in self.dirty.items()]
+        self.dirty = {}
+        return payloads
+
+    async def flush(self):
+        """
+        Write every dirty key now, off the event loop.
+        """
+        payloads = self._snapshot()
+        if payloads:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._write_all, payloads)
+
+    def flush_sync(self):
+        self.executor.submit(self._write_all, self._snapshot()).result()
+
+    @staticmethod
+    def _write_all(payloads):
+        for name, write, payload in payloads:
+            try:
+                write(payload)
+            except Exception as e:
+                logging.error(f"Error saving {name}: {e}")
+
+# Define SQLiteDatabase Class
+class SQLiteDatabase:
+    def __init__(self, path: str):
+        """
+        Initialize a SQLite database owned by a single writer thread.
+        Every call runs on that thread in its own transaction, in submission order,
+        so disk I/O never blocks the event loop.
+        :param path: Path of the database file.
+        """
+        self.path = path
+        self.schemas = []
+        self.conn = None  # Opened lazily on the writer thread
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def add_schema(self, schema: str):
+        """
+        Register a schema script, applied when the connection is first opened.
+        """
+        self.schemas.append(schema)
+
+    def transaction(self, fn, *args):
+        """
+        Run fn(conn, *args) in one transaction. Must be called on the writer thread.
+        """
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("PRAGMA foreign_keys=ON")
+            for schema in self.schemas:
+                self.conn.executescript(schema)
+        with self.conn:  # Commit on success, roll back on error
+            return fn(self.conn, *args)
+
+    async def run(self, fn, *args):
+        """
+        Run fn(conn, *args) on the writer thread and return its result.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.transaction, fn, *args)
+
+    def run_sync(self, fn, *args):
+        """
+        Run fn(conn, *args) on the writer thread and block for its result (startup only).
+        """
+        return self.executor.submit(self.transaction, fn, *args).result()
+
+    def submit(self, fn, *args):
+        """
+        Queue fn(conn, *args) on the writer thread without waiting for it.
+        """
+        def log_failure(future):
+            if future.exception() is not None:
+                logging.error(f"Database write {fn.__name__} failed: {future.exception()}")
+
+        self.executor.submit(self.transaction, fn, *args).add_done_callback(log_failure)
+
+    def close(self):
+        """
+        Wait for queued writes, then close the connection.
+        """
+        def close_connection():
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+        self.executor.submit(close_connection)
+        self.executor.shutdown(wait=True)
+
+# Define LFGStore Class
+class LFGStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS lfg_requests (
+            lfg_uuid TEXT PRIMARY KEY,
+            expires_at INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            flushed_version INTEGER NOT NULL DEFAULT 0,
+            ready INTEGER NOT NULL DEFAULT 0,
+            game_link TEXT,
+            game_password TEXT,
+            dm_sent INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS lfg_players (
+            lfg_uuid TEXT NOT NULL REFERENCES lfg_requests(lfg_uuid) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL,
+            display_name TEXT NOT NULL,
+            PRIMARY KEY (lfg_uuid, user_id)
+        );
+        CREATE TABLE IF NOT EXISTS lfg_messages (
+            lfg_uuid TEXT NOT NULL REFERENCES lfg_requests(lfg_uuid) ON DELETE CASCADE,
+            channel_key TEXT NOT NULL,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL UNIQUE,
+            PRIMARY KEY (lfg_uuid, channel_key)
+        );
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        """
+        Initialize durable storage for active LFG requests.
+        Each state change is written as its own small statement, never as a full snapshot.
+        """
+        self.database = database
+        database.add_schema(self.SCHEMA)
+
+    def save_request(self, lfg_uuid, data):
+        def write(conn, lfg_uuid, expires_at, players):
+            conn.execute("INSERT OR REPLACE INTO lfg_requests (lfg_uuid, expires_at) VALUES (?, ?)", (lfg_uuid, expires_at))
+            conn.executemany(
+                "INSERT OR REPLACE INTO lfg_players (lfg_uuid, user_id, display_name) VALUES (?, ?, ?)",
+                [(lfg_uuid, user_id, name) for user_id, name in players]
+            )
+        self.database.submit(write, lfg_uuid, data["expires_at"], list(data["players"].items()))
+
+    def add_player(self, lfg_uuid, user_id, display_name, version):
+        def write(conn, lfg_uuid, user_id, display_name, version):
+            conn.execute(
+                "INSERT OR REPLACE INTO lfg_players (lfg_uuid, user_id, display_name) VALUES (?, ?, ?)",
+                (lfg_uuid, user_id, display_name)
+            )
+            conn.execute("UPDATE lfg_requests SET version = ? WHERE lfg_uuid = ?", (version, lfg_uuid))
+        self.database.submit(write, lfg_uuid, user_id, display_name, version)
+
+    def remove_player(self, lfg_uuid, user_id, version):
+        def write(conn, lfg_uuid, user_id, version):
+            conn.execute("DELETE FROM lfg_players WHERE lfg_uuid = ? AND user_id = ?", (lfg_uuid, user_id))
+            conn.execute("UPDATE lfg_requests SET version = ? WHERE lfg_uuid = ?", (version, lfg_uuid))
+        self.database.submit(write, lfg_uuid, user_id, version)
+
+    def add_message(self, lfg_uuid, channel_key, channel_id, message_id):
+        def write(conn, *row):
+            conn.execute(
+                "INSERT OR REPLACE INTO lfg_messages (lfg_uuid, channel_key, channel_id, message_id) VALUES (?, ?, ?, ?)",
+                row
+            )
+        self.database.submit(write, lfg_uuid, str(channel_key), channel_id, message_id)
+
+    def remove_message(self, message_id):
+        def write(conn, message_id):
+            conn.execute("DELETE FROM lfg_messages WHERE message_id = ?", (message_id,))
+        self.database.submit(write, message_id)
+
+    def update_state(self, lfg_uuid, data):
+        def write(conn, *row):
+            conn.execute(
+                "UPDATE lfg_requests SET flushed_version = ?, ready = ?, game_link = ?, game_password = ?, dm_sent = ? "
+                "WHERE lfg_uuid = ?",
+                row
+            )
+        self.database.submit(
+            write, data.get("flushed_version", 0), int(bool(data.get("ready"))), data.get("game_link"),
+            data.get("game_password"), int(bool(data.get("dm_sent"))), lfg_uuid
+        )
+
+    def delete(self, lfg_uuid):
+        def write(conn, lfg_uuid):
+            conn.execute("DELETE FROM lfg_requests WHERE lfg_uuid = ?", (lfg_uuid,))
+        self.database.submit(write, lfg_uuid)
+
+    async def load(self):
+        """
+        Load every stored LFG request as (lfg_uuid, data) pairs; messages are returned as
+        {channel_key: (channel_id, message_id)} for the caller to re-bind.
+        """
+        def read(conn):
+            requests_by_uuid = {}
+            for row in conn.execute(
+                "SELECT lfg_uuid, expires_at, version, flushed_version, ready, game_link, game_password, dm_sent FROM lfg_requests"
+            ):
+                lfg_uuid, expires_at, version, flushed_version, ready, game_link, game_password, dm_sent = row
+                data = {
+                    "players": {},
+                    "messages": {},
+                    "expires_at": expires_at,
+                    "version": version,
+                    "flushed_version": flushed_version,
+                    "ready": bool(ready),
+                    "dm_sent": bool(dm_sent),
+                }
+                if game_link is not None:
+                    data["game_link"] = game_link
+                    data["game_password"] = game_password
+                requests_by_uuid[lfg_uuid] = data
+            # Insertion order (rowid) keeps the player list in join order
+            for lfg_uuid, user_id, display_name in conn.execute(
+                "SELECT lfg_uuid, user_id, display_name FROM lfg_players ORDER BY rowid"
+            ):
+                if lfg_uuid in requests_by_uuid:
+                    requests_by_uuid[lfg_uuid]["players"][user_id] = display_name
+            for lfg_uuid, channel_key, channel_id, message_id in conn.execute(
+                "SELECT lfg_uuid, channel_key, channel_id, message_id FROM lfg_messages"
+            ):
+                if lfg_uuid in requests_by_uuid:
+                    requests_by_uuid[lfg_uuid]["messages"][channel_key] = (channel_id, message_id)
+            return list(requests_by_uuid.items())
+
+        return await self.database.run(read)
+
+# Define ConfigStore Class
+class ConfigStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS connections (
+            channel_key TEXT PRIMARY KEY,
+            webhook_url TEXT,
+            webhook_id INTEGER,
+            filter TEXT
+        );
+        CREATE INDEX IF NOT EXISTS connections_by_filter ON connections (filter);
+        CREATE TABLE IF NOT EXISTS bans (
+            user_id TEXT PRIMARY KEY,
+            user_name TEXT,
+            reason TEXT,
+            expiration INTEGER,
+            lifted INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS bans_by_expiration ON bans (expiration) WHERE expiration IS NOT NULL;
+        CREATE TABLE IF NOT EXISTS admins (
+            user_id INTEGER PRIMARY KEY
+        );
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        """
+        Initialize storage for channel connections and filters, bans and trusted admins.
+        The bot serves reads from its in-memory globals; these methods run on the database writer thread.
+        """
+        self.database = database
+        database.add_schema(self.SCHEMA)
+
+    @staticmethod
+    def migrate(conn):
+        """
+        Bring tables created by earlier versions up to the current schema.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(bans)")}
+        if "lifted" not in columns:
+            conn.execute("ALTER TABLE bans ADD COLUMN lifted INTEGER NOT NULL DEFAULT 0")
+
+    @staticmethod
+    def import_json(conn, read_legacy):
+        """
+        One-shot import of the legacy JSON files; recorded in the meta table so it never runs twice.
+        :param read_legacy: Callable returning (webhooks, filters, bans, admins); only called if the import is due.
+        """
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'json_imported'").fetchone():
+            return False
+        webhooks, filters, bans, admins = read_legacy()
+        ConfigStore.write_connections(conn, [
+            (key, webhooks.get(key), filters.get(key)) for key in set(webhooks) | set(filters)
+        ])
+        ConfigStore.write_bans(conn, list(bans.items()))
+        ConfigStore.write_admins(conn, [(admin_id, True) for admin_id in admins])
+        conn.execute("INSERT INTO meta (key, value) VALUES ('json_imported', ?)", (str(int(time.time())),))
+        return True
+
+    @staticmethod
+    def load_connections(conn):
+        webhooks, filters = {}, {}
+        for channel_key, webhook_url, webhook_id, filter in conn.execute(
+            "SELECT channel_key, webhook_url, webhook_id, filter FROM connections"
+        ):
+            if webhook_url is not None:
+                webhooks[channel_key] = {"url": webhook_url, "id": webhook_id}
+            if filter is not None:
+                filters[channel_key] = filter
+        return webhooks, filters
+
+    @staticmethod
+    def load_bans(conn):
+        bans = {}
+        for user_id, user_name, reason, expiration, lifted in conn.execute(
+            "SELECT user_id, user_name, reason, expiration, lifted FROM bans"
+        ):
+            bans[user_id] = {"User ID#": user_name, "reason": reason, "expiration": expiration}
+            if lifted:
+                bans[user_id]["lifted"] = True
+        return bans
+
+    @staticmethod
+    def load_admins(conn):
+        return {user_id for (user_id,) in conn.execute("SELECT user_id FROM admins")}
+
+    @staticmethod
+    def write_connections(conn, rows):
+        """
+        Upsert (channel_key, webhook_data, filter) rows; a row with neither is deleted.
+        """
+        for channel_key, webhook_data, filter in rows:
+            if webhook_data is None and filter is None:
+                conn.execute("DELETE FROM connections WHERE channel_key = ?", (channel_key,))
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO connections (channel_key, webhook_url, webhook_id, filter) VALUES (?, ?, ?, ?)",
+                (
+                    channel_key,
+                    webhook_data["url"] if webhook_data else None,
+                    webhook_data.get("id") if webhook_data else None,
+                    filter
+                )
+            )
+
+    @staticmethod
+    def write_bans(conn, rows):
+        """
+        Upsert (user_id, ban) rows; a row whose ban is None is deleted.
+        """
+        for user_id, ban in rows:
+            if ban is None:
+                conn.execute("DELETE FROM bans WHERE user_id = ?", (user_id,))
+                continue
+            conn.execute(
+                "INSERT OR REPLACE INTO bans (user_id, user_name, reason, expiration, lifted) VALUES (?, ?, ?, ?, ?)",
+                (user_id, ban.get("User ID#"), ban.get("reason"), ban.get("expiration"), int(bool(ban.get("lifted"))))
+            )
+
+    @staticmethod
+    def write_admins(conn, rows):
+        """
+        Insert or delete (admin_id, is_admin) rows.
+        """
+        for admin_id, is_admin in rows:
+            if is_admin:
+                conn.execute("INSERT OR IGNORE INTO admins (user_id) VALUES (?)", (admin_id,))
+            else:
+                conn.execute("DELETE FROM admins WHERE user_id = ?", (admin_id,))
+
+# Define RelayStore Class
+class RelayStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS relay_origins (
+            original_id TEXT PRIMARY KEY,
+            original_channel_id TEXT NOT NULL,
+            user_id TEXT,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS relay_origins_by_created_at ON relay_origins (created_at);
+        CREATE TABLE IF NOT EXISTS relay_copies (
+            message_id TEXT PRIMARY KEY,
+            original_id TEXT NOT NULL REFERENCES relay_origins(original_id) ON DELETE CASCADE,
+            channel_id TEXT NOT NULL,
+            webhook INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS relay_copies_by_origin ON relay_copies (original_id);
+        CREATE TABLE IF NOT EXISTS relay_reactions (
+            original_id TEXT NOT NULL REFERENCES relay_origins(original_id) ON DELETE CASCADE,
+            emoji TEXT NOT NULL,
+            message_id TEXT NOT NULL,
+            PRIMARY KEY (original_id, emoji, message_id)
+        );
+    """
+
+    def __init__(self, database: SQLiteDatabase, retention: float):
+        """
+        Initialize the on-disk relay history behind the in-memory RelayMap.
+        Every relayed copy is written as it is recorded; lookups that miss the map are served
+        by one indexed query, so startup never loads the history into memory.
+        :param retention: Time (in seconds) relay history is kept before compaction drops it.
+        """
+        self.database = database
+        self.retention = retention
+        self.task = None
+        database.add_schema(self.SCHEMA)
+
+    def record(self, original_id, original_channel_id, user_id, channel_id, message_id, via_webhook=False):
+        def write(conn, original_id, original_channel_id, user_id, channel_id, message_id, via_webhook, created_at):
+            conn.execute(
+                "INSERT OR IGNORE INTO relay_origins (original_id, original_channel_id, user_id, created_at) VALUES (?, ?, ?, ?)",
+                (original_id, original_channel_id, user_id, created_at)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO relay_copies (message_id, original_id, channel_id, webhook) VALUES (?, ?, ?, ?)",
+                (message_id, original_id, channel_id, int(via_webhook))
+            )
+        self.database.submit(write, original_id, original_channel_id, user_id, channel_id, message_id, via_webhook, time.time())
+
+    def delete(self, original_id):
+        def write(conn, original_id):
+            conn.execute("DELETE FROM relay_origins WHERE original_id = ?", (original_id,))
+        self.database.submit(write, original_id)
+
+    def mark_reaction(self, original_id, emoji_key, message_id, placed):
+        """
+        Record that the bot's mirrored reaction was placed on (or removed from) a message in a relay group.
+        """
+        def write(conn, original_id, emoji_key, message_id, placed):
+            if placed:
+                conn.execute(
+                    "INSERT OR IGNORE INTO relay_reactions (original_id, emoji, message_id) "
+                    "SELECT original_id, ?, ? FROM relay_origins WHERE original_id = ?",
+                    (emoji_key, message_id, original_id)
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM relay_reactions WHERE original_id = ? AND emoji = ? AND message_id = ?",
+                    (original_id, emoji_key, message_id)
+                )
+        self.database.submit(write, original_id, emoji_key, message_id, placed)
+
+    async def lookup(self, message_id):
+        """
+        Resolve an original or relayed message ID from disk.
+        Returns a tuple of (original_id, entry), or (None, None) if the message is not stored.
+        """
+        def read(conn, message_id):
+            rows = conn.execute(
+                "SELECT o.original_id, o.original_channel_id, o.user_id, c.channel_id, c.message_id, c.webhook "
+                "FROM relay_origins o LEFT JOIN relay_copies c ON c.original_id = o.original_id "
+                "WHERE o.original_id = COALESCE((SELECT original_id FROM relay_copies WHERE message_id = ?), ?) "
+                "ORDER BY c.rowid",
+                (message_id, message_id)
+            ).fetchall()
+            if not rows:
+                return None, None
+            original_id, original_channel_id, user_id = rows[0][:3]
+            relayed_messages = []
+            for _, _, _, channel_id, relayed_id, webhook in rows:
+                if relayed_id is None:
+                    continue
+                relayed = {"channel_id": channel_id, "message_id": relayed_id}
+                if webhook:
+                    relayed["webhook"] = True
+                relayed_messages.append(relayed)
+            reactions = {}  # emoji -> message IDs carrying the bot's mirrored reaction
+            for emoji_key, reacted_id in conn.execute(
+                "SELECT emoji, message_id FROM relay_reactions WHERE original_id = ?", (original_id,)
+            ):
+                reactions.setdefault(emoji_key, set()).add(reacted_id)
+            return original_id, {
+                "original_channel_id": original_channel_id,
+                "relayed_messages": relayed_messages,
+                "user_id": user_id,
+                "reactions": reactions,
+            }
+
+        return await self.database.run(read, str(message_id))
+
+    @staticmethod
+    def compact(conn, cutoff):
+        return conn.execute("DELETE FROM relay_origins WHERE created_at < ?", (cutoff,)).rowcount
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._compact_periodically())
+
+    async def _compact_periodically(self):
+        while True:
+            try:
+                removed = await self.database.run(self.compact, time.time() - self.retention)
+                if removed:
+                    logging.info(f"Compacted relay store: dropped {removed} message(s) older than the retention period.")
+            except Exception as e:
+                logging.error(f"Error compacting relay store: {e}")
+            await asyncio.sleep(60 * 60)
+
+# Define TableStreamClient Class
+class TableStreamClient:
+    def __init__(self, get_session, api_url: str, timeout: float, attempts: int, failure_threshold: int, cooldown: float):
+        """
+        Initialize the TableStream API client.
+        Calls share the pooled HTTP session, are bounded by a per-attempt timeout, retried with
+        jittered exponential backoff, and short-circuited by a circuit breaker during outages.
+        :param get_session: Coroutine function returning the shared aiohttp session.
+        :param failure_threshold: Consecutive failed calls that open the breaker.
+        :param cooldown: Time (in seconds) the breaker stays open before one trial call is allowed.
+        """
+        self.get_session = get_session
+        self.api_url = api_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.attempts = max(attempts, 1)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.in_flight = {}  # Single-flight key -> shared task
+
+    def _allow(self):
+        if self.failures < self.failure_threshold:
+            return True
+        if time.monotonic() < self.open_until or self.trial_in_flight:
+            return False
+        self.trial_in_flight = True  # Half-open: let one call probe TableStream
+        return True
+
+    def _record(self, success):
+        self.trial_in_flight = False
+        if success:
+            if self.failures >= self.failure_threshold:
+                logging.info("TableStream circuit breaker closed.")
+            self.failures = 0
+            return
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            logging.warning(f"TableStream circuit breaker open for {self.cooldown} seconds after {self.failures} consecutive failures.")
+
+    async def create_room(self, room_name: str, game_type: str, max_players: int, ttl: int) -> tuple[str | None, str | None]:
+        """
+        Create a private room and return (room_url, password), or (None, None) on failure.
+        """
+        token_bearer = os.environ.get("TABLESTREAM_BEARER_TOKEN")
+        if not token_bearer:
+            logging.error("Bearer token for TableStream API is missing!")
+            return None, None
+        if not self._allow():
+            logging.warning("TableStream circuit breaker is open; skipping room creation.")
+            return None, None
+
+        headers = {
+            "Authorization": f"Bearer {token_bearer}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "roomName": room_name,
+            "gameType": game_type,
+            "maxPlayers": max_players,
+            "private": True,
+            "initialScheduleTTLInSeconds": ttl
+        }
+
+        success = False
+        try:
+            session = await self.get_session()
+            for attempt in range(self.attempts):
+                retryable = True
+                try:
+                    async with session.post(self.api_url, json=payload, headers=headers, timeout=self.timeout) as response:
+                        if response.status == 201:  # HTTP Created
+                            body = await response.json()
+                            room = body.get("room") if isinstance(body, dict) else None
+                            if isinstance(room, dict) and room.get("roomUrl"):
+                                success = True
+                                logging.info(f"Successfully generated TableStream link: {room['roomUrl']}")
+                                return room["roomUrl"], room.get("password")
+                            logging.error(f"TableStream returned a malformed room: {body}")
+                            retryable = False
+                        else:
+                            error = await response.text()
+                            logging.error(f"Failed to generate TableStream link. Status: {response.status}, Error: {error}")
+                            retryable = response.status == 429 or response.status >= 500
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    logging.error(f"TableStream request failed (attempt {attempt + 1}/{self.attempts}): {e!r}")
+
+                if not retryable or attempt + 1 == self.attempts:
                     break
+                await asyncio.sleep(random.uniform(0, min(8, 0.5 * 2 ** attempt)))  # Full jitter
+            return None, None
+        finally:
+            self._record(success)  # Always settle the breaker, including a half-open trial
 
-            if self.requests.qsize() >= self.max_requests:
-                wait_time = self.period - (now - self.requests.queue[0]).total_seconds()
-                logging.warning(f"Rate limit reached. Pausing for {wait_time:.2f} seconds.")
-                await asyncio.sleep(wait_time)
+    async def single_flight(self, key, call):
+        """
+        Run call() at most once at a time per key; concurrent callers share its result.
+        """
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+# Define TableStreamRoomPool Class
+class TableStreamRoomPool:
+    def __init__(self, create_room, size: int, ttl: float, margin: float):
+        """
+        Initialize a pool of pre-created TableStream rooms, refilled in the background.
+        :param create_room: Coroutine function returning (room_url, password), or (None, None) on failure.
+        :param size: Number of rooms kept ready.
+        :param ttl: Lifetime (in seconds) TableStream gives an unused room.
+        :param margin: Rooms are handed out only while at least this much of their lifetime remains.
+        """
+        self.create_room = create_room
+        self.size = size
+        self.shelf_life = max(ttl - margin, 0)
+        self.rooms = deque()  # (expires_at, room_url, password), oldest first
+        self.wakeup = None  # Created lazily inside the running event loop
+        self.task = None
+        self.hits = 0
+        self.misses = 0
+
+    def start(self):
+        if self.task is None and self.size > 0:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    def _prune(self):
+        now = time.monotonic()
+        while self.rooms and self.rooms[0][0] <= now:
+            self.rooms.popleft()
+
+    def take(self):
+        """
+        Hand out a pooled room as (room_url, password), or None if the pool is empty.
+        """
+        self._prune()
+        if self.wakeup is not None:
+            self.wakeup.set()  # Refill the slot in the background
+        if not self.rooms:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, room_url, password = self.rooms.popleft()
+        return room_url, password
+
+    async def _run(self):
+        backoff = 5
+        while True:
+            self._prune()
+            if len(self.rooms) < self.size:
+                try:
+                    room_url, password = await self.create_room()
+                except Exception as e:
+                    logging.error(f"Error refilling TableStream room pool: {e}")
+                    room_url, password = None, None
+                if room_url:
+                    self.rooms.append((time.monotonic() + self.shelf_life, room_url, password))
+                    backoff = 5
+                    continue
+                # TableStream is unavailable; live calls remain the fallback meanwhile
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 600)
+                continue
+
+            # Full: sleep until the oldest room retires or a room is taken
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.rooms[0][0] - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
 
-            await self.requests.put(now)
+# Define RelayMap Class
+class RelayMap:
+    def __init__(self, max_entries: int, ttl: float, deleted_ttl: float):
+        """
+        Initialize a bounded, time-evicting map of relayed text messages.
+        :param max_entries: Maximum number of original messages tracked at once.
+        :param ttl: Time (in seconds) after which an entry is evicted.
+        :param deleted_ttl: Time (in seconds) a deleted message ID is remembered, so late copies are discarded.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.deleted_ttl = deleted_ttl
+        self.entries = OrderedDict()  # original_id -> entry, oldest first
+        self.index = {}  # original or relayed message ID -> original_id
+        self.deleted = OrderedDict()  # Recently deleted message ID -> deletion time, oldest first
+        self.eviction_hooks = []
+        self.expired_evictions = 0
+        self.overflow_evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, original_id):
+        return original_id in self.entries
+
+    @property
+    def evictions(self):
+        return self.expired_evictions + self.overflow_evictions
+
+    def add_eviction_hook(self, hook):
+        """
+        Register a callable invoked as hook(original_id, entry, reason) whenever an entry is evicted.
+        """
+        self.eviction_hooks.append(hook)
 
-# Define PauseManager Class
-class PauseManager:
-    def __init__(self, violation_threshold: int, pause_duration: int):
+    def record_relay(self, original_id, original_channel_id, user_id, channel_id, message_id, via_webhook=False):
         """
-        Initialize the pause manager.
-        :param violation_threshold: Number of rate limit violations to trigger a pause.
-        :param pause_duration: Duration (in seconds) of the pause.
+        Record a relayed copy of an original message, creating the entry if needed.
         """
-        self.violation_threshold = violation_threshold
-        self.pause_duration = pause_duration
-        self.violations = 0
-        self.last_violation_time = datetime.now()
-
-    async def handle_violation(self):
-        now = datetime.now()
-        if (now - self.last_violation_time).total_seconds() > 60:
-            self.violations = 0  # Reset violations after 1 minute
-        self.violations += 1
-        self.last_violation_time = now
-
-        if self.violations >= self.violation_threshold:
-            logging.critical(f"Too many rate limit violations! Pausing for {self.pause_duration} seconds.")
-            await asyncio.sleep(self.pause_duration)
-            self.violations = 0
-
-# Initialize RateLimiter and PauseManager
-rate_limiter = RateLimiter(max_requests=50, period=1)  # Adjust to Discord limits
-pause_manager = PauseManager(violation_threshold=5, pause_duration=30)
+        now = time.monotonic()
+        self._evict_expired(now)
+
+        entry = self.entries.get(original_id)
+        if entry is None:
+            entry = {
+                "original_channel_id": original_channel_id,
+                "relayed_messages": [],
+                "user_id": user_id,  # Track user ID
+                "created_at": now,
+            }
+            self.entries[original_id] = entry
+            self.index[original_id] = original_id
+            while len(self.entries) > self.max_entries:
+                oldest_id = next(iter(self.entries))
+                self._evict(oldest_id, "overflow")
+
+        relayed = {
+            "channel_id": channel_id,
+            "message_id": message_id
+        }
+        if via_webhook:
+            relayed["webhook"] = True  # Webhook copies can only be edited or deleted through the webhook
+        entry["relayed_messages"].append(relayed)
+        self.index[message_id] = original_id
+        return entry
+
+    def restore(self, original_id, entry):
+        """
+        Load an entry fetched from the relay store back into the map.
+        It counts as new for eviction purposes.
+        """
+        if original_id in self.entries:
+            return self.entries[original_id]
+        entry["created_at"] = time.monotonic()
+        self.entries[original_id] = entry
+        self.index[original_id] = original_id
+        for relayed in entry["relayed_messages"]:
+            self.index[relayed["message_id"]] = original_id
+        while len(self.entries) > self.max_entries:
+            self._evict(next(iter(self.entries)), "overflow")
+        return entry
+
+    def find_origin(self, message_id):
+        """
+        Resolve an original or relayed message ID to its entry.
+        Returns a tuple of (original_id, entry), or (None, None) if the message is not tracked.
+        """
+        self._evict_expired(time.monotonic())
+        original_id = self.index.get(str(message_id))
+        if original_id is None:
+            return None, None
+        return original_id, self.entries[original_id]
+
+    def remove(self, original_id):
+        """
+        Remove an entry along with every index entry pointing to it.
+        """
+        entry = self.entries.pop(original_id, None)
+        if entry is None:
+            return None
+        self.index.pop(original_id, None)
+        for relayed in entry["relayed_messages"]:
+            self.index.pop(relayed["message_id"], None)
+        return entry
+
+    def mark_deleted(self, message_id):
+        """
+        Remember that a message was deleted, so relays of it still queued or in flight are discarded.
+        """
+        now = time.monotonic()
+        self._expire_deleted(now)
+        self.deleted.pop(message_id, None)
+        self.deleted[message_id] = now
+        while len(self.deleted) > self.max_entries:
+            self.deleted.popitem(last=False)
+
+    def was_deleted(self, message_id):
+        self._expire_deleted(time.monotonic())
+        return message_id in self.deleted
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "indexed_messages": len(self.index),
+            "expired_evictions": self.expired_evictions,
+            "overflow_evictions": self.overflow_evictions,
+        }
+
+    def _expire_deleted(self, now):
+        cutoff = now - self.deleted_ttl
+        while self.deleted and next(iter(self.deleted.values())) <= cutoff:
+            self.deleted.popitem(last=False)
+
+    def _evict_expired(self, now):
+        # Entries are kept in creation order, so only the head needs checking
+        cutoff = now - self.ttl
+        while self.entries:
+            oldest_id, oldest = next(iter(self.entries.items()))
+            if oldest["created_at"] > cutoff:
+                break
+            self._evict(oldest_id, "expired")
+
+    def _evict(self, original_id, reason):
+        entry = self.remove(original_id)
+        if reason == "expired":
+            self.expired_evictions += 1
+        else:
+            self.overflow_evictions += 1
+        for hook in self.eviction_hooks:
+            try:
+                hook(original_id, entry, reason)
+            except Exception as e:
+                logging.error(f"Error in relay map eviction hook for message ID {original_id}: {e}")
+
+# Define RoutingTable Class
+class RoutingTable:
+    def __init__(self, resolve_channel):
+        """
+        Initialize a routing table for connected channels.
+        :param resolve_channel: Callable that returns a channel object for a channel ID, or None.
+        """
+        self.resolve_channel = resolve_channel
+        self.channels = {}  # channel_id -> (storage key, filter)
+        self.by_filter = {}  # filter -> [channel_id, ...]
+        self.resolved = {}  # filter -> [channel, ...], resolved lazily
+
+    def rebuild(self, webhook_urls, channel_filters):
+        """
+        Rebuild the table from the stored webhook connections and channel filters.
+        """
+        channels = {}
+        by_filter = {}
+        for key in webhook_urls:
+            try:
+                channel_id = int(key.split('_')[1])
+            except (IndexError, ValueError):
+                logging.error(f"Invalid connection key in webhook data: {key}")
+                continue
+            channel_filter = str(channel_filters.get(key, 'none'))  # Ensure string type
+            channels[channel_id] = (key, channel_filter)
+            by_filter.setdefault(channel_filter, []).append(channel_id)
+
+        self.channels = channels
+        self.by_filter = by_filter
+        self.resolved = {}
+        logging.info(f"Routing table rebuilt: {len(channels)} channels across {len(by_filter)} filters.")
+
+    def is_connected(self, channel_id):
+        return channel_id in self.channels
+
+    def filter_for(self, channel_id):
+        """
+        Return the filter of a connected channel, or 'none' if the channel is not connected.
+        """
+        route = self.channels.get(channel_id)
+        return route[1] if route else 'none'
+
+    def key_for(self, channel_id):
+        """
+        Return the '<guild_id>_<channel_id>' storage key of a connected channel.
+        """
+        route = self.channels.get(channel_id)
+        return route[0] if route else None
+
+    def destinations(self, channel_filter, exclude=None):
+        """
+        Return the resolved channel objects sharing the given filter, skipping the excluded channel ID.
+        """
+        channels = self.resolved.get(channel_filter)
+        if channels is None:
+            channels = []
+            for channel_id in self.by_filter.get(channel_filter, []):
+                channel = self.resolve_channel(channel_id)
+                if channel:
+                    channels.append(channel)
+                else:
+                    logging.warning(f"Connected channel {channel_id} is not accessible. Skipping until the next rebuild.")
+            self.resolved[channel_filter] = channels
+        if exclude is None:
+            return channels
+        return [channel for channel in channels if channel.id != exclude]
+
+# Define SendLanes Class
+class SendLanes:
+    def __init__(self, max_concurrency: int):
+        """
+        Initialize per-destination send lanes.
+        Sends to the same channel run in submission order; different channels run in parallel.
+        :param max_concurrency: Maximum number of sends in flight across all lanes.
+        """
+        self.max_concurrency = max_concurrency
+        self.semaphore = None  # Created lazily inside the running event loop
+        self.lanes = {}  # channel_id -> deque of (send, future)
+
+    def submit(self, channel_id, send):
+        """
+        Queue a send on the destination channel's lane.
+        :param send: Zero-argument coroutine function performing the send.
+        :return: Future resolved with the send's result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        lane = self.lanes.get(channel_id)
+        if lane is None:
+            lane = self.lanes[channel_id] = deque()
+            asyncio.create_task(self._drain(channel_id, lane))
+        lane.append((send, future))
+        return future
+
+    async def _drain(self, channel_id, lane):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            while lane:
+                send, future = lane.popleft()
+                if future.cancelled():
+                    continue
+                async with self.semaphore:
+                    try:
+                        result = await send()
+                    except Exception as e:
+                        if not future.cancelled():
+                            future.set_exception(e)
+                    else:
+                        if not future.cancelled():
+                            future.set_result(result)
+        finally:
+            # The lane is empty here; the next submit starts a fresh drain task
+            del self.lanes[channel_id]
+
+# Initialize the log sampler
+log_sampler = LogSampler(rate=LOG_SAMPLE_RATE)
+
+# Initialize the rate limit scheduler
+rate_limit_scheduler = RateLimitScheduler(violation_threshold=5, violation_window=60, backoff_duration=30)
+
+# Initialize the relay work queue and send lanes
+relay_queue = RelayQueue(maxsize=RELAY_QUEUE_MAXSIZE, high_water=RELAY_QUEUE_HIGH_WATER)
+relay_workers = []
+relay_lanes = SendLanes(max_concurrency=RELAY_MAX_CONCURRENCY)
+
+# Initialize the relay map
+message_map = RelayMap(max_entries=RELAY_MAP_MAX_ENTRIES, ttl=RELAY_MAP_TTL, deleted_ttl=RELAY_DELETED_TTL)
+
+# Initialize the reaction coalescer; in-memory reaction state is dropped along with evicted relay entries
+# and reloaded from the relay store when the entry is resolved again
+reaction_coalescer = ReactionCoalescer(
+    window=REACTION_COALESCE_WINDOW,
+    flush=lambda original_id, emoji_key: relay_queue.submit(
+        PRIORITY_REACTION,
+        lambda: apply_reaction_plan(original_id, emoji_key),
+        f"reactions {emoji_key} on message {original_id}"
+    )
+)
+message_map.add_eviction_hook(lambda original_id, entry, reason: reaction_coalescer.forget(original_id))
+
+# Initialize the database and the durable LFG, configuration and relay stores
+database = SQLiteDatabase(DATABASE_PATH)
+lfg_store = LFGStore(database)
+config_store = ConfigStore(database)
+relay_store = RelayStore(database, retention=RELAY_STORE_RETENTION)
 
 # Load webhook data from persistent storage with validation
 def load_webhook_data():
@@ -163,7 +1623,7 @@ def load_trusted_admins():
     Load the list of trusted admins from persistent storage.
     If the file is missing or invalid, initialize with the default super admins.
     """
-    default_super_admins = [582548598584115211, 115375818938646531]  # Include both IDs here
+    default_super_admins = list(DEFAULT_SUPER_ADMINS)
 
     try:
         with open(TRUSTED_ADMINS_PATH, 'r') as f:
@@ -181,31 +1641,70 @@ def load_trusted_admins():
         logging.warning(f"{TRUSTED_ADMINS_PATH} not found or corrupted. Initializing with default super admins.")
         return default_super_admins  # Fallback if file is missing or unreadable
 
-# Save banned users to persistent storage
-def save_banned_users():
-    try:
-        with open(BANNED_USERS_PATH, "w") as f:
-            json.dump(banned_users, f, indent=4)
-    except Exception as e:
-        logging.error(f"Error saving banned users to {BANNED_USERS_PATH}: {e}")
-
-# Save trusted admins to persistent storage
-def save_trusted_admins():
-    try:
-        with open(TRUSTED_ADMINS_PATH, "w") as f:
-            json.dump(trusted_admins, f, indent=4)
-    except Exception as e:
-        logging.error(f"Error saving trusted admins to {TRUSTED_ADMINS_PATH}: {e}")
-
-# Load data on startup
-banned_users = load_banned_users()
-trusted_admins = load_trusted_admins()
+# Save a user's ban (or its removal) to persistent storage (written behind, see WriteBehindStore)
+def save_ban(user_id):
+    persistence.mark_dirty("bans", user_id)
+
+# Load configuration from the database on startup; the legacy JSON files are imported on first run
+def load_configuration(conn):
+    ConfigStore.migrate(conn)
+    read_legacy = lambda: (load_webhook_data(), load_channel_filters(), load_banned_users(), load_trusted_admins())
+    if ConfigStore.import_json(conn, read_legacy):
+        logging.info("Imported the JSON configuration files into the database.")
+    webhooks, filters = ConfigStore.load_connections(conn)
+    admins = ConfigStore.load_admins(conn)
+    if not admins:
+        admins = set(DEFAULT_SUPER_ADMINS)
+        ConfigStore.write_admins(conn, [(admin_id, True) for admin_id in admins])
+    return webhooks, filters, ConfigStore.load_bans(conn), admins
+
+WEBHOOK_URLS, CHANNEL_FILTERS, banned_users, trusted_admins = database.run_sync(load_configuration)
+
+# Helper to check bans; lifted bans are kept as offense history, and expired temporary bans
+# no longer count even before the sweep lifts them
+def is_banned(user_id):
+    ban = banned_users.get(user_id)
+    return ban is not None and not ban.get("lifted") and (ban["expiration"] is None or ban["expiration"] > time.time())
 
 class GameFormat(Enum):
     PAUPER_EDH = "Pauper EDH"
 
-WEBHOOK_URLS = load_webhook_data()
-CHANNEL_FILTERS = load_channel_filters()
+# Initialize the write-behind persistence layer; it shares the database writer thread,
+# and each flush writes one transaction per collection. Globals are looked up at flush time,
+# so reloaded ones are picked up.
+persistence = WriteBehindStore(delay=PERSIST_DELAY, executor=database.executor)
+persistence.register(
+    "connections",
+    lambda keys: [(key, WEBHOOK_URLS.get(key), CHANNEL_FILTERS.get(key)) for key in keys],
+    lambda rows: database.transaction(ConfigStore.write_connections, rows)
+)
+persistence.register(
+    "bans",
+    lambda keys: [(user_id, dict(banned_users[user_id]) if user_id in banned_users else None) for user_id in keys],
+    lambda rows: database.transaction(ConfigStore.write_bans, rows)
+)
+
+# Initialize the ban expiration scheduler with every stored temporary ban
+ban_expirations = DeadlineScheduler(on_expired=lambda user_ids: lift_expired_bans(user_ids))
+for banned_user_id, ban in banned_users.items():
+    if ban["expiration"] is not None and not ban.get("lifted"):
+        ban_expirations.schedule(banned_user_id, ban["expiration"])
+
+async def lift_expired_bans(user_ids):
+    """
+    Lift every temporary ban that expired in one scheduler sweep and persist them in one flush.
+    Lifted bans stay on record so a repeat offense is escalated.
+    """
+    lifted = [
+        user_id for user_id in user_ids
+        if user_id in banned_users and not banned_users[user_id].get("lifted") and not is_banned(user_id)
+    ]
+    for user_id in lifted:
+        banned_users[user_id]["lifted"] = True
+        save_ban(user_id)
+    if lifted:
+        await persistence.flush()
+        logging.info(f"Lifted {len(lifted)} expired temporary ban(s): {', '.join(lifted)}")
 
 # Define intents (includes messages intent)
 intents = discord.Intents.default()
@@ -216,230 +1715,572 @@ intents.messages = True
 
 client = commands.Bot(command_prefix='/', intents=intents)
 
+# Initialize the LFG timeout scheduler
+lfg_timeouts = DeadlineScheduler(on_expired=lambda lfg_uuids: expire_lfgs(lfg_uuids))
+
+# Initialize the TableStream client and room pool
+tablestream_client = TableStreamClient(
+    get_session=lambda: initialize_aiohttp_session(),
+    api_url=TABLESTREAM_API_URL,
+    timeout=TABLESTREAM_TIMEOUT,
+    attempts=TABLESTREAM_ATTEMPTS,
+    failure_threshold=TABLESTREAM_BREAKER_THRESHOLD,
+    cooldown=TABLESTREAM_BREAKER_COOLDOWN
+)
+tablestream_pool = TableStreamRoomPool(
+    create_room=lambda: generate_tablestream_link({"id": str(uuid.uuid4())}, GameFormat.PAUPER_EDH, 4),
+    size=TABLESTREAM_POOL_SIZE,
+    ttl=TABLESTREAM_ROOM_TTL,
+    margin=TABLESTREAM_POOL_MARGIN
+)
+
+# Initialize the DM dispatcher
+dm_dispatcher = DMDispatcher(client, cooldown=DM_COOLDOWN, max_concurrency=DM_MAX_CONCURRENCY)
+
+# Routes are resolved lazily, once the client's channel cache is populated
+routing_table = RoutingTable(client.get_channel)
+routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)
+
 # -------------------------------------------------------------------------
 # Webhook Functions
 # -------------------------------------------------------------------------
 
 async def initialize_aiohttp_session():
+    """
+    Initialize the global aiohttp session with a pooled, keep-alive connector.
+    """
     global global_aiohttp_session
-    if global_aiohttp_session is None:
-        global_aiohttp_session = aiohttp.ClientSession()
+    if global_aiohttp_session is None or global_aiohttp_session.closed:
+        global_aiohttp_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HTTP_CONNECTION_LIMIT, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=5),
+        )
         logging.info("Global aiohttp session initialized successfully.")
+    return global_aiohttp_session
+
+async def close_aiohttp_session():
+    """
+    Close the global aiohttp session and release its pooled connections.
+    """
+    global global_aiohttp_session
+    if global_aiohttp_session is not None and not global_aiohttp_session.closed:
+        await global_aiohttp_session.close()
+        logging.info("Global aiohttp session closed.")
+    global_aiohttp_session = None
+
+async def webhook_request(method, url, payload=None, params=None):
+    """
+    Perform a webhook request through the pooled session and the rate limit scheduler.
+    Returns a tuple of (status, parsed JSON body or None), or (None, None) on connection errors.
+    """
+    session = await initialize_aiohttp_session()
+    route = f"webhook:{url.split('/webhooks/')[-1].split('/')[0]}"  # Webhooks have their own buckets
+    try:
+        await rate_limit_scheduler.acquire(route)
+        async with session.request(method, url, json=payload, params=params) as response:
+            rate_limit_scheduler.update(route, response.headers, response.status)
+            if response.status == 204:
+                return response.status, None  # No content to parse
+            elif response.status >= 200 and response.status < 300:
+                return response.status, await response.json()
+            else:
+                logging.error(f"Webhook {method} failed. Status code: {response.status}")
+                logging.error(await response.text())
+                return response.status, None
+    except aiohttp.ClientError as e:
+        logging.error(f"aiohttp.ClientError: {e}")
+    except asyncio.TimeoutError:
+        logging.error(f"Webhook {method} timed out after {HTTP_TIMEOUT} seconds.")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+    return None, None
+
+async def send_webhook_message(webhook_url, content=None, embeds=None, username=None, avatar_url=None, wait=False):
+    """
+    Send a message using a webhook to a specific channel.
+    Handles content, embeds, username attribution, and avatar.
+    With wait=True, Discord returns the created message so it can be edited or deleted later.
+    """
+    data = {}
+    if content:
+        data["content"] = content
+    if embeds:
+        data["embeds"] = embeds
+    if username:
+        data["username"] = username
+    if avatar_url:
+        data["avatar_url"] = avatar_url
+    data["allowed_mentions"] = RELAY_ALLOWED_MENTIONS
+
+    status, body = await webhook_request("POST", webhook_url, payload=data, params={"wait": "true"} if wait else None)
+    if status is not None and 200 <= status < 300:
+        logging.debug("Message sent to webhook with response: %s", status)
+        return body
+    return None
+
+async def edit_webhook_message(webhook_url, message_id, content):
+    """
+    Edit a message previously sent through a webhook.
+    """
+    status, _ = await webhook_request("PATCH", f"{webhook_url}/messages/{message_id}", payload={"content": content, "allowed_mentions": RELAY_ALLOWED_MENTIONS})
+    return status is not None and 200 <= status < 300
+
+async def delete_webhook_message(webhook_url, message_id):
+    """
+    Delete a message previously sent through a webhook.
+    """
+    status, _ = await webhook_request("DELETE", f"{webhook_url}/messages/{message_id}")
+    return status is not None and 200 <= status < 300
+
+def save_connection(channel_key):
+    """
+    Schedule a channel's webhook data and filter (or their removal) to be saved to persistent storage.
+    """
+    persistence.mark_dirty("connections", channel_key)
+
+# -------------------------------------------------------------------------
+# Gateway Functions (Text Messages and BigLFG Embeds)
+# -------------------------------------------------------------------------
+
+class TableStreamGameTypes(Enum):
+    MTGCommander = "MTGCommander"
+
+def table_stream_game_type(format: str) -> TableStreamGameTypes:
+    # Always map Pauper EDH to MTGCommander
+    if format == "PAUPER_EDH":
+        return TableStreamGameTypes.MTGCommander
+    raise ValueError(f"Unsupported game format: {format}")
+
+def sanitize_room_name(requester_name: str) -> str:
+    """
+    Generate a valid room name by sanitizing the requester's name.
+    Ensures the name meets TableStream's requirements.
+    """
+    base_room_name = f"{requester_name}'s Pauper EDH Room"
+    # Remove problematic characters and trim to 100 characters
+    sanitized_name = re.sub(r"[^a-zA-Z0-9\s]", "", base_room_name).strip()[:100]
+    if len(sanitized_name) > 100:
+        sanitized_name = sanitized_name[:100]
+    return sanitized_name
+
+# Text Message Relay
+async def relay_text_message(source_message, destination_channel):
+    """
+    Relay a text message across servers.
+    In webhook relay mode the copy is posted through the destination's webhook under the
+    author's name and avatar; otherwise (or if the webhook fails) it is sent through the Gateway API.
+    """
+    original_id = str(source_message.id)
+    if message_map.was_deleted(original_id):
+        return None  # The original was deleted while this relay was queued
+    try:
+        relayed_message_id = None
+        via_webhook = False
+
+        webhook_data = WEBHOOK_URLS.get(routing_table.key_for(destination_channel.id)) if RELAY_MODE == "webhook" else None
+        if webhook_data:
+            relayed = await send_webhook_message(
+                webhook_data["url"],
+                content=source_message.content,
+                username=f"{source_message.author.display_name} (from {source_message.guild.name})"[:80],
+                avatar_url=source_message.author.display_avatar.url,
+                wait=True
+            )
+            if relayed:
+                relayed_message_id = relayed["id"]
+                via_webhook = True
+            else:
+                logging.warning(f"Webhook relay to channel {destination_channel.id} failed. Falling back to the Gateway API.")
+
+        if relayed_message_id is None:
+            formatted_content = (
+                f"{source_message.author.name} (from {source_message.guild.name}) said:\n"
+                f"{source_message.content}"
+            )
+            relayed_message = await destination_channel.send(content=formatted_content)
+            relayed_message_id = relayed_message.id
+
+        relay_channel_id = str(destination_channel.id)
+        relay_message_id = str(relayed_message_id)
+
+        # The original was deleted while this copy was in flight; its deletion has already been propagated
+        if message_map.was_deleted(original_id):
+            relayed = {"channel_id": relay_channel_id, "message_id": relay_message_id}
+            if via_webhook:
+                relayed["webhook"] = True
+            await delete_relayed_copy(relayed)
+            log_sampler.log("relay", logging.INFO, "Removed copy %s of deleted message %s.", relay_message_id, original_id)
+            return None
+
+        # Update the message_map (and the relay store behind it) with the user ID included
+        relay_args = (original_id, str(source_message.channel.id), str(source_message.author.id), relay_channel_id, relay_message_id)
+        message_map.record_relay(*relay_args, via_webhook=via_webhook)
+        relay_store.record(*relay_args, via_webhook=via_webhook)
+
+        log_sampler.log("relay", logging.INFO, "Relayed message %s to channel %s (%d messages tracked).", original_id, relay_channel_id, len(message_map))
+        return relay_message_id
+    except Exception as e:
+        logging.error(f"Error relaying message to channel {destination_channel.id}: {e}")
+        return None
+
+async def relay_to_destinations(source_message, source_filter):
+    """
+    Relay a text message to every connected channel sharing its filter.
+    """
+    # Each destination gets its own ordered lane, so all copies go out in parallel.
+    # The lanes are submitted to before the first await, which keeps per-channel order
+    # even when several relay workers pick up consecutive messages.
+    relays = [
+        relay_lanes.submit(destination_channel.id, lambda destination_channel=destination_channel: relay_text_message(source_message, destination_channel))
+        for destination_channel in routing_table.destinations(source_filter, exclude=source_message.channel.id)
+    ]
+    await asyncio.gather(*relays)
+
+# Relayed Copy Helpers
+def partial_message(channel_id, message_id):
+    """
+    Build a partial message handle from stored IDs.
+    Edits, deletions and reactions can be applied to it without a fetch_message round trip.
+    Cached channels are preferred so the handle knows its guild (e.g. for jump_url).
+    """
+    channel = client.get_channel(int(channel_id)) or client.get_partial_messageable(int(channel_id))
+    return channel.get_partial_message(int(message_id))
+
+async def resolve_relay(message_id):
+    """
+    Resolve an original or relayed message ID to (original_id, entry), or (None, None).
+    Misses in message_map fall back to the relay store, and hits there are cached again.
+    """
+    original_id, entry = message_map.find_origin(message_id)
+    if original_id is not None:
+        return original_id, entry
+    original_id, entry = await relay_store.lookup(message_id)
+    if original_id is None:
+        return None, None
+    # Mirrored reactions come back with the entry, so they can still be removed later
+    reaction_coalescer.restore(original_id, entry.pop("reactions"))
+    return original_id, message_map.restore(original_id, entry)
+
+def webhook_url_for(channel_id):
+    """
+    Return the stored webhook URL for a connected channel, or None.
+    """
+    webhook_data = WEBHOOK_URLS.get(routing_table.key_for(int(channel_id)))
+    return webhook_data["url"] if webhook_data else None
+
+async def delete_relayed_copy(relayed):
+    """
+    Delete one relayed copy, through its channel's webhook if it was posted by one.
+    Returns False if a webhook copy can no longer be reached.
+    """
+    if relayed.get("webhook"):
+        webhook_url = webhook_url_for(relayed["channel_id"])
+        return bool(webhook_url) and await delete_webhook_message(webhook_url, relayed["message_id"])
+    await partial_message(relayed["channel_id"], relayed["message_id"]).delete()
+
+async def apply_to_relayed(relayed_messages, action, description):
+    """
+    Apply an action to each relayed message concurrently, on its channel's send lane.
+    :param relayed_messages: List of {"channel_id", "message_id"} records.
+    :param action: Coroutine function taking a record; it may return False to report a skipped copy.
+    :param description: Short label used in log messages.
+    """
+    async def run(relayed):
+        try:
+            if await action(relayed) is False:
+                logging.warning(f"Could not propagate {description} to message ID {relayed['message_id']} in channel {relayed['channel_id']}. Skipping.")
+                return
+            log_sampler.log("propagate", logging.INFO, "Propagated %s to message ID: %s in channel %s", description, relayed["message_id"], relayed["channel_id"])
+        except discord.NotFound:
+            logging.warning(f"Message {relayed['message_id']} not found. Skipping {description}.")
+        except Exception as e:
+            logging.error(f"Error propagating {description} to message ID {relayed['message_id']}: {e}")
+
+    await asyncio.gather(*[
+        relay_lanes.submit(int(relayed["channel_id"]), lambda relayed=relayed: run(relayed))
+        for relayed in relayed_messages
+    ])
+
+# Text Message Edit Propagation
+async def propagate_text_edit(message_id, author_name, guild_name, content):
+    """
+    Handle and propagate edits to text messages across servers.
+    """
+    try:
+        logging.debug("Processing edit for message ID: %s", message_id)
+
+        # Only edits to the original message are propagated
+        original_id, data = await resolve_relay(message_id)
+        if original_id != str(message_id):
+            logging.debug("Original message %s not found in message_map. Cannot propagate edits.", message_id)
+            return
+
+        gateway_content = f"{author_name} (from {guild_name}) said:\n{content}"
 
-async def send_webhook_message(webhook_url, content=None, embeds=None, username=None, avatar_url=None):
+        async def edit_copy(relayed):
+            if relayed.get("webhook"):
+                webhook_url = webhook_url_for(relayed["channel_id"])
+                return bool(webhook_url) and await edit_webhook_message(webhook_url, relayed["message_id"], content)
+            await partial_message(relayed["channel_id"], relayed["message_id"]).edit(content=gateway_content)
+
+        # Edit all relayed messages
+        await apply_to_relayed(data["relayed_messages"], edit_copy, "message edit")
+    except Exception as e:
+        logging.error(f"Error in propagate_text_edit: {e}")
+
+# Text Message Deletion Propagation
+async def propagate_text_delete(original_id, data):
     """
-    Send a message using a webhook to a specific channel.
-    Handles content, embeds, username attribution, and avatar.
+    Delete all relayed copies of an original message that has been removed from message_map.
     """
-    async with aiohttp.ClientSession() as session:
-        data = {}
-        if content:
-            data["content"] = content
-        if embeds:
-            data["embeds"] = embeds
-        if username:
-            data["username"] = username
-        if avatar_url:
-            data["avatar_url"] = avatar_url
+    try:
+        logging.debug("Deleting relayed messages for original message ID: %s", original_id)
 
-        try:
-            async with session.post(webhook_url, json=data) as response:
-                if response.status == 204:
-                    logging.info(f"Message sent successfully to webhook at {webhook_url}.")
-                    return None  # No content to parse
-                elif response.status >= 200 and response.status < 300:
-                    logging.info(f"Message sent to webhook at {webhook_url} with response: {response.status}")
-                    return await response.json()  # Parse response only for non-204 success codes
-                else:
-                    logging.error(f"Failed to send message. Status code: {response.status}")
-                    logging.error(await response.text())
-        except aiohttp.ClientError as e:
-            logging.error(f"aiohttp.ClientError: {e}")
-        except discord.HTTPException as e:
-            logging.error(f"discord.HTTPException: {e}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
+        # Delete all relayed messages
+        await apply_to_relayed(data["relayed_messages"], delete_relayed_copy, "message deletion")
+    except Exception as e:
+        logging.error(f"Error in propagate_text_delete: {e}")
 
-    return None
+# Text Message Reaction Propagation
+async def record_reaction(channel_id, message_id, emoji, user_id, added):
+    """
+    Buffer a reaction add or removal for mirroring across its relay group.
+    """
+    if not routing_table.is_connected(channel_id):
+        return  # Only messages in connected channels can be relayed
+    original_id, data = await resolve_relay(message_id)
+    if original_id is None:
+        return  # Not a relayed message
+    reaction_coalescer.record(original_id, emoji, message_id, user_id, added)
 
-def save_webhook_data():
+async def apply_reaction_plan(original_id, emoji_key):
     """
-    Save the current webhook data to persistent storage.
+    Mirror the coalesced reaction state of a relay group onto every message in it.
+    Adds and removals that cancelled out within the window produce no API calls.
     """
+    key = (original_id, emoji_key)
     try:
-        with open(PERSISTENT_DATA_PATH, 'w') as f:
-            json.dump(WEBHOOK_URLS, f, indent=4)
+        _, data = await resolve_relay(original_id)
+        if data is None:
+            reaction_coalescer.forget(original_id)
+            return
+
+        group = {relayed["message_id"]: relayed for relayed in data["relayed_messages"]}
+        group[original_id] = {"channel_id": data["original_channel_id"], "message_id": original_id}
+        adds, removes = reaction_coalescer.plan(key, group)
+        emoji = reaction_coalescer.emojis.get(key)
+        if emoji is None or (not adds and not removes):
+            reaction_coalescer.prune(key)
+            return
+
+        async def add_to_copy(relayed):
+            await partial_message(relayed["channel_id"], relayed["message_id"]).add_reaction(emoji)
+            reaction_coalescer.mark(key, relayed["message_id"], True)
+            relay_store.mark_reaction(original_id, emoji_key, relayed["message_id"], True)
+
+        async def remove_from_copy(relayed):
+            # Mirrored reactions belong to the bot, so the bot's own reaction is removed
+            await partial_message(relayed["channel_id"], relayed["message_id"]).remove_reaction(emoji, client.user)
+            reaction_coalescer.mark(key, relayed["message_id"], False)
+            relay_store.mark_reaction(original_id, emoji_key, relayed["message_id"], False)
+
+        await asyncio.gather(
+            apply_to_relayed([group[message_id] for message_id in adds], add_to_copy, f"reaction {emoji}"),
+            apply_to_relayed([group[message_id] for message_id in removes], remove_from_copy, f"reaction removal {emoji}")
+        )
+        reaction_coalescer.prune(key)
     except Exception as e:
-        logging.error(f"Error saving webhook data to {PERSISTENT_DATA_PATH}: {e}")
+        logging.error(f"Error in apply_reaction_plan for message ID {original_id}: {e}")
 
-def save_channel_filters():
+# BigLFG Embed Propagation
+async def relay_lfg_embed(embed, lfg_uuid, destination_channel):
     """
-    Save the current channel filters to persistent storage.
+    Relay a BigLFG embed to other connected servers using the Gateway API.
+    Player interactions are handled by the LFGButton dynamic items encoded in the view.
     """
     try:
-        with open(CHANNEL_FILTERS_PATH, 'w') as f:
-            json.dump(CHANNEL_FILTERS, f, indent=4)
+        sent_message = await destination_channel.send(embed=embed, view=create_lfg_view(lfg_uuid))
+        logging.debug("Relayed BigLFG embed to channel %s", destination_channel.id)
+        return sent_message
     except Exception as e:
-        logging.error(f"Error saving channel filters to {CHANNEL_FILTERS_PATH}: {e}")
-
-# -------------------------------------------------------------------------
-# Gateway Functions (Text Messages and BigLFG Embeds)
-# -------------------------------------------------------------------------
+        logging.error(f"Error relaying BigLFG embed to channel {destination_channel.id}: {e}")
+        return None
 
-class TableStreamGameTypes(Enum):
-    MTGCommander = "MTGCommander"
+# LFG Index Helpers
+def register_lfg(lfg_uuid, data, persist=True):
+    """
+    Track a new LFG in active_embeds, index every one of its messages and arm its timeout.
+    :param persist: False when the LFG was just restored from the database.
+    """
+    active_embeds[lfg_uuid] = data
+    for message in data["messages"].values():
+        lfg_message_index[message.id] = lfg_uuid
+    lfg_timeouts.schedule(lfg_uuid, data["expires_at"])
+    if persist:
+        lfg_store.save_request(lfg_uuid, data)
 
-def table_stream_game_type(format: str) -> TableStreamGameTypes:
-    # Always map Pauper EDH to MTGCommander
-    if format == "PAUPER_EDH":
-        return TableStreamGameTypes.MTGCommander
-    raise ValueError(f"Unsupported game format: {format}")
+def add_lfg_message(lfg_uuid, channel_key, message):
+    """
+    Attach a newly sent embed copy to an active LFG and index it.
+    """
+    active_embeds[lfg_uuid]["messages"][channel_key] = message
+    lfg_message_index[message.id] = lfg_uuid
+    lfg_store.add_message(lfg_uuid, channel_key, message.channel.id, message.id)
 
-def sanitize_room_name(requester_name: str) -> str:
+def drop_lfg_message(lfg_uuid, message_id):
     """
-    Generate a valid room name by sanitizing the requester's name.
-    Ensures the name meets TableStream's requirements.
+    Detach a deleted embed copy from an active LFG so later updates skip it.
     """
-    base_room_name = f"{requester_name}'s Pauper EDH Room"
-    # Remove problematic characters and trim to 100 characters
-    sanitized_name = re.sub(r"[^a-zA-Z0-9\s]", "", base_room_name).strip()[:100]
-    if len(sanitized_name) > 100:
-        sanitized_name = sanitized_name[:100]
-    return sanitized_name
+    lfg_message_index.pop(message_id, None)
+    messages = active_embeds[lfg_uuid]["messages"]
+    for channel_key, message in list(messages.items()):
+        if message.id == message_id:
+            del messages[channel_key]
+    lfg_store.remove_message(message_id)
 
-# Text Message Relay
-async def relay_text_message(source_message, destination_channel):
+def add_lfg_player(lfg_uuid, user_id, display_name):
     """
-    Relay a text message across servers using the Gateway API.
+    Add a player to an active LFG and schedule an embed update.
     """
-    try:
-        formatted_content = (
-            f"{source_message.author.name} (from {source_message.guild.name}) said:\n"
-            f"{source_message.content}"
-        )
+    active_embeds[lfg_uuid]["players"][user_id] = display_name
+    mark_lfg_dirty(lfg_uuid)
+    lfg_store.add_player(lfg_uuid, user_id, display_name, active_embeds[lfg_uuid]["version"])
 
-        relayed_message = await destination_channel.send(content=formatted_content)
+def remove_lfg_player(lfg_uuid, user_id):
+    """
+    Remove a player from an active LFG and schedule an embed update.
+    """
+    del active_embeds[lfg_uuid]["players"][user_id]
+    mark_lfg_dirty(lfg_uuid)
+    lfg_store.remove_player(lfg_uuid, user_id, active_embeds[lfg_uuid]["version"])
 
-        original_id = str(source_message.id)
-        relay_channel_id = str(destination_channel.id)
-        relay_message_id = str(relayed_message.id)
+def remove_lfg(lfg_uuid):
+    """
+    Stop tracking an LFG and drop its messages from the index.
+    """
+    data = active_embeds.pop(lfg_uuid, None)
+    if data is not None:
+        for message in data["messages"].values():
+            lfg_message_index.pop(message.id, None)
+        lfg_store.delete(lfg_uuid)
+    lfg_timeouts.cancel(lfg_uuid)
+    return data
 
-        # Update the message_map with the user ID included
-        if original_id not in message_map:
-            message_map[original_id] = {
-                "original_channel_id": str(source_message.channel.id),
-                "relayed_messages": [],
-                "user_id": str(source_message.author.id)  # Track user ID
+async def restore_lfgs():
+    """
+    Reload persisted LFG requests after a restart and re-bind them to their embed messages.
+    Buttons keep working because LFGButton routes clicks by the lfg_uuid in their custom ID;
+    expired requests time out on the scheduler's next sweep.
+    """
+    try:
+        restored = 0
+        for lfg_uuid, data in await lfg_store.load():
+            if lfg_uuid in active_embeds:
+                continue  # on_ready fired again after a reconnect
+            data["messages"] = {
+                channel_key: partial_message(channel_id, message_id)
+                for channel_key, (channel_id, message_id) in data["messages"].items()
             }
-        message_map[original_id]["relayed_messages"].append({
-            "channel_id": relay_channel_id,
-            "message_id": relay_message_id
-        })
-
-        logging.info(f"Updated message_map: {json.dumps(message_map, indent=4)}")
-        return relayed_message
+            register_lfg(lfg_uuid, data, persist=False)
+            restored += 1
+            # Finish work interrupted by the restart: unflushed clicks or a ready game that was never announced
+            if data["version"] > data["flushed_version"] or (data["ready"] and not data["dm_sent"]):
+                mark_lfg_dirty(lfg_uuid)
+        logging.info(f"Restored {restored} active LFG request(s) from the database.")
     except Exception as e:
-        logging.error(f"Error relaying message to channel {destination_channel.id}: {e}")
-        return None
+        logging.error(f"Error restoring LFG requests from the database: {e}")
 
-# Text Message Edit Propagation
-async def propagate_text_edit(before, after):
+def find_lfg(message_id):
     """
-    Handle and propagate edits to text messages across servers.
+    Return the lfg_uuid of the active LFG that owns the given message, or None.
     """
-    try:
-        logging.info(f"Processing edit for message ID: {before.id}")
-        
-        # Find the original message in message_map
-        for original_id, data in message_map.items():
-            if str(before.id) == original_id:
-                # Edit all relayed messages
-                for relayed in data["relayed_messages"]:
-                    try:
-                        channel = client.get_channel(int(relayed["channel_id"]))
-                        if not channel:
-                            logging.warning(f"Channel {relayed['channel_id']} not accessible. Skipping.")
-                            continue
-
-                        message = await channel.fetch_message(int(relayed["message_id"]))
-                        await message.edit(content=f"{after.author.name} (from {after.guild.name}) said:\n{after.content}")
-                        logging.info(f"Message edit propagated to message ID: {relayed['message_id']} in channel {relayed['channel_id']}")
-                    except Exception as e:
-                        logging.error(f"Error editing message ID {relayed['message_id']}: {e}")
-                return
-        
-        logging.warning(f"Original message {before.id} not found in message_map. Cannot propagate edits.")
-    except Exception as e:
-        logging.error(f"Error in propagate_text_edit: {e}")
+    lfg_uuid = lfg_message_index.get(message_id)
+    return lfg_uuid if lfg_uuid in active_embeds else None
 
-# Text Message Reaction Propagation
-async def propagate_reaction_add(reaction, user):
+# Helper to Render the BigLFG Embed
+def render_lfg_embed(data, is_game_ready):
     """
-    Handle and propagate reactions added to text messages across servers.
+    Build the LFG embed for the current player list and game state.
     """
-    try:
-        if user.bot:
-            return  # Ignore bot reactions
-
-        logging.info(f"Reaction {reaction.emoji} added by {user.name} in channel {reaction.message.channel.id}")
-
-        for original_id, data in message_map.items():
-            relayed_messages = data["relayed_messages"]
-            if any(str(reaction.message.id) == relayed["message_id"] for relayed in relayed_messages) or str(reaction.message.id) == original_id:
-                logging.info(f"Match found for message ID: {reaction.message.id} (Original ID: {original_id})")
-
-                # Propagate the reaction to all associated messages
-                for relayed in relayed_messages:
-                    if str(reaction.message.id) != relayed["message_id"]:  # Skip the triggering message
-                        try:
-                            channel = client.get_channel(int(relayed["channel_id"]))
-                            if not channel:
-                                logging.warning(f"Channel {relayed['channel_id']} not accessible. Skipping.")
-                                continue
-
-                            message = await channel.fetch_message(int(relayed["message_id"]))
-                            await message.add_reaction(reaction.emoji)
-                            logging.info(f"Propagated reaction {reaction.emoji} to message ID: {relayed['message_id']} in channel {relayed['channel_id']}")
-                        except Exception as e:
-                            logging.error(f"Error propagating reaction to message ID {relayed['message_id']}: {e}")
-
-                # Add reaction to the original message if not already triggered
-                if str(reaction.message.id) != original_id:
-                    try:
-                        original_channel = client.get_channel(int(data["original_channel_id"]))
-                        if original_channel:
-                            original_message = await original_channel.fetch_message(int(original_id))
-                            await original_message.add_reaction(reaction.emoji)
-                            logging.info(f"Propagated reaction {reaction.emoji} to original message ID: {original_id}")
-                    except discord.NotFound:
-                        logging.warning(f"Original message {original_id} not found. Skipping reaction propagation to it.")
-                    except Exception as e:
-                        logging.error(f"Error propagating reaction to the original message ID {original_id}: {e}")
+    players = data["players"]
+    embed = discord.Embed(
+        title="Your game is ready!" if is_game_ready else "Looking for more players...",
+        color=discord.Color.green() if is_game_ready else discord.Color.yellow(),
+    )
+    embed.set_author(
+        name="PDH LFG Bot",
+        icon_url=IMAGE_URL,
+        url="https://github.com/TryhardClay/PDH-LFG-Bot"
+    )
+    if not is_game_ready:
+        embed.set_thumbnail(url=IMAGE_URL)
+
+    # Add the player list
+    embed.add_field(
+        name="Players:",
+        value="\n".join([f"{i + 1}. {name}" for i, name in enumerate(players.values())]),
+        inline=False
+    )
+
+    if is_game_ready:
+        # Add the Table Stream link to the embed
+        embed.add_field(
+            name="Table Stream Game:",
+            value=f"[Click this link to join your Table Stream game.]({data['game_link']})",
+            inline=False
+        )
 
-                return  # Exit after processing the match
+        # Add Spelltable prompt
+        embed.add_field(name="Spelltable:", value="**Or link your own Spelltable link below...**", inline=False)
 
-        logging.warning(f"Message ID {reaction.message.id} not found in message_map. Cannot propagate reactions.")
-    except Exception as e:
-        logging.error(f"Error in propagate_reaction_add: {e}")
+    return embed
 
-# BigLFG Embed Propagation
-async def relay_lfg_embed(embed, source_filter, initiating_player, destination_channel):
+# Helper to Edit Every Copy of a BigLFG Embed
+async def edit_lfg_messages(lfg_uuid, messages, is_current=None, **fields):
     """
-    Relay a BigLFG embed to other connected servers using the Gateway API.
-    Manages the embed view and player interactions independently.
+    Apply one edit to every copy of an LFG embed concurrently,
+    through the per-channel send lanes; discord.py handles their rate limits.
+    :param is_current: Optional callable; copies whose turn comes after it returns False are skipped,
+                       so a stale render never overwrites a newer one.
     """
-    try:
-        sent_message = await destination_channel.send(embed=embed, view=create_lfg_view())
-        logging.info(f"Relayed BigLFG embed to channel {destination_channel.id}")
-        return sent_message
-    except Exception as e:
-        logging.error(f"Error relaying BigLFG embed to channel {destination_channel.id}: {e}")
-        return None
+    async def edit(channel_key, message):
+        if is_current is not None and not is_current():
+            return
+        try:
+            await message.edit(**fields)
+        except Exception as e:
+            logging.error(f"Error updating embed in channel {channel_key} for LFG UUID {lfg_uuid}: {e}")
+
+    await asyncio.gather(*[
+        relay_lanes.submit(message.channel.id, lambda channel_key=channel_key, message=message: edit(channel_key, message))
+        for channel_key, message in list(messages.items())
+    ])
+
+# Helpers to Coalesce BigLFG Updates
+def mark_lfg_dirty(lfg_uuid):
+    """
+    Record a state change of an LFG and schedule one coalesced embed update for it.
+    """
+    data = active_embeds.get(lfg_uuid)
+    if data is None:
+        return
+    data["version"] = data.get("version", 0) + 1
+    if lfg_uuid not in lfg_flush_pending:
+        lfg_flush_pending.add(lfg_uuid)
+        asyncio.create_task(flush_lfg_later(lfg_uuid))
+
+async def flush_lfg_later(lfg_uuid):
+    """
+    Push the latest state of an LFG once the coalescing window closes.
+    """
+    await asyncio.sleep(LFG_UPDATE_WINDOW)
+    lfg_flush_pending.discard(lfg_uuid)
+    await relay_queue.submit(PRIORITY_LFG_UPDATE, lambda: update_embeds(lfg_uuid), f"LFG update {lfg_uuid}")
 
 # Helper to Update Embeds
 async def update_embeds(lfg_uuid):
     """
-    Update all embeds associated with the given LFG UUID.
+    Update all embeds associated with the given LFG UUID to its latest state.
     """
     try:
         if lfg_uuid not in active_embeds:
@@ -448,258 +2289,238 @@ async def update_embeds(lfg_uuid):
 
         data = active_embeds[lfg_uuid]
         players = data["players"]
-        is_game_ready = len(players) == 4
-
-        # Generate the Table Stream link only once and reuse it
-        if is_game_ready and "game_link" not in data:
-            logging.info("Generating Table Stream link for the first time...")
-            game_data = {"id": str(uuid.uuid4())}
-            game_format = GameFormat.PAUPER_EDH
-            player_count = 4
-
-            # Call API only once
-            game_link, game_password = await generate_tablestream_link(game_data, game_format, player_count)
 
-            if game_link:
-                data["game_link"] = game_link  # Store the generated game link
-                data["game_password"] = game_password  # Store the password
-            else:
-                logging.error("Failed to generate Table Stream link.")
-                data["game_link"] = "Error generating game link"
-                data["game_password"] = None
+        # Assign the Table Stream link only once and reuse it
+        if len(players) == 4 and "game_link" not in data:
+            await assign_tablestream_room(lfg_uuid, data)
 
-        # Update all embeds with the player list, Table Stream link, and other information
-        for channel_id, message in data["messages"].items():
-            try:
-                embed = discord.Embed(
-                    title="Your game is ready!" if is_game_ready else "Looking for more players...",
-                    color=discord.Color.green() if is_game_ready else discord.Color.yellow(),
-                )
-                embed.set_author(
-                    name="PDH LFG Bot",
-                    icon_url=IMAGE_URL,
-                    url="https://github.com/TryhardClay/PDH-LFG-Bot"
-                )
-                if not is_game_ready:
-                    embed.set_thumbnail(url=IMAGE_URL)
-
-                # Add the player list
-                embed.add_field(
-                    name="Players:",
-                    value="\n".join([f"{i + 1}. {name}" for i, name in enumerate(players.values())]),
-                    inline=False
+        # Render from the latest state; skip if a newer update has already been pushed
+        version = data.get("version", 0)
+        if version <= data.get("flushed_version", -1):
+            return
+        data["flushed_version"] = version
+        is_game_ready = len(players) == 4 and "game_link" in data
+        if is_game_ready:
+            data["ready"] = True  # Locks the player list against further clicks
+        lfg_store.update_state(lfg_uuid, data)
+
+        # Render the embed once for this state change
+        embed = render_lfg_embed(data, is_game_ready)
+
+        if is_game_ready:
+            # Cancel the timeout
+            lfg_timeouts.cancel(lfg_uuid)
+            logging.info(f"Timeout canceled for LFG UUID {lfg_uuid} as the game is ready.")
+
+            # Set the final embed and remove the buttons in a single edit per copy
+            await edit_lfg_messages(lfg_uuid, data["messages"], embed=embed, view=None)
+
+            # Send DMs to all players with the same game link and password
+            if "dm_sent" not in data or not data["dm_sent"]:  # Ensure DMs are only sent once
+                data["dm_sent"] = True  # Mark DMs as sent
+                lfg_store.update_state(lfg_uuid, data)
+                message = next(iter(data["messages"].values()), None)
+                # Link to the original message in the server
+                message_link = message.jump_url if message else "unavailable"
+                dm_content = (
+                    f"**Your game is ready!**\n\n"
+                    f"**Table Stream Link:** {data['game_link']}\n"
+                    f"**Password:** {data['game_password']}\n\n"
+                    f"You can also view the game request message here: [Click to view the message.]({message_link})"
                 )
+                sent = await dm_dispatcher.send_many(players, dm_content, kind=f"game_ready:{lfg_uuid}")
+                logging.info(f"Game ready DMs sent to {sent}/{len(players)} players for LFG UUID {lfg_uuid}.")
+        else:
+            await edit_lfg_messages(
+                lfg_uuid, data["messages"],
+                is_current=lambda: data.get("flushed_version") == version,
+                embed=embed
+            )
 
-                if is_game_ready:
-                    # Add the Table Stream link to the embed
-                    embed.add_field(
-                        name="Table Stream Game:",
-                        value=f"[Click this link to join your Table Stream game.]({data['game_link']})",
-                        inline=False
-                    )
-
-                    # Add Spelltable prompt
-                    embed.add_field(name="Spelltable:", value="**Or link your own Spelltable link below...**", inline=False)
-
-                    # Remove buttons
-                    view = discord.ui.View()
-                    await message.edit(view=view)
-
-                    # Cancel the timeout task
-                    task = data.pop("task", None)
-                    if task and not task.done():
-                        task.cancel()
-                        logging.info(f"Timeout task canceled for LFG UUID {lfg_uuid} as the game is ready.")
-
-                    # Send DMs to all players with the same game link and password
-                    if "dm_sent" not in data or not data["dm_sent"]:  # Ensure DMs are only sent once
-                        for user_id in players:
-                            try:
-                                user = await client.fetch_user(user_id)
-                                if user:
-                                    # Link to the original message in the server
-                                    message_link = f"https://discord.com/channels/{message.guild.id}/{message.channel.id}/{message.id}"
-                                    dm_content = (
-                                        f"**Your game is ready!**\n\n"
-                                        f"**Table Stream Link:** {data['game_link']}\n"
-                                        f"**Password:** {data['game_password']}\n\n"
-                                        f"You can also view the game request message here: [Click to view the message.]({message_link})"
-                                    )
-                                    await user.send(dm_content)
-                                    logging.info(f"DM sent to {user.name} (ID: {user.id}).")
-                            except Exception as e:
-                                logging.error(f"Failed to DM player {user_id}: {e}")
-                        data["dm_sent"] = True  # Mark DMs as sent
-
-                await message.edit(embed=embed)
-
-            except Exception as e:
-                logging.error(f"Error updating embed in channel {channel_id} for LFG UUID {lfg_uuid}: {e}")
+        # A ready game has no buttons left, so it no longer needs tracking
+        if is_game_ready:
+            remove_lfg(lfg_uuid)
     except Exception as e:
         logging.error(f"Error in update_embeds for LFG UUID {lfg_uuid}: {e}")
 
-# Helper to Create BigLFG View
-def create_lfg_view():
+# BigLFG Button Handlers
+async def join_lfg(button_interaction: discord.Interaction, lfg_uuid: str):
     """
-    Create and return a Discord UI View with JOIN and LEAVE buttons for the BigLFG embed.
+    Handle a JOIN click on any copy of an LFG embed.
     """
-    view = discord.ui.View(timeout=45 * 60)  # 45-minute timeout
-
-    async def join_button_callback(button_interaction: discord.Interaction):
-        try:
-            user_id = str(button_interaction.user.id)
-
-            # Check if the user is banned
-            if user_id in banned_users:
-                logging.warning(f"Banned user {button_interaction.user.name} (ID: {user_id}) attempted to join a game.")
+    try:
+        user_id = str(button_interaction.user.id)
 
-                # Send a DM to inform the user about the ban
-                try:
-                    reason = banned_users[user_id]["reason"]
-                    expiration = (
-                        f"Your ban will expire <t:{banned_users[user_id]['expiration']}:R>."
-                        if banned_users[user_id]["expiration"] else "Your ban is permanent."
-                    )
-                    dm_message = (
-                        f"You are currently banned from joining games through this bot.\n"
-                        f"**Reason:** {reason}\n{expiration}\n\n"
-                        f"For appeals, inform the server admin, reach out to Clay (User ID: 582548598584115211) on Discord, "
-                        f"or email: gaming4tryhards@gmail.com."
-                    )
-                    await button_interaction.user.send(dm_message)
-                except Exception as e:
-                    logging.error(f"Failed to DM banned user {button_interaction.user.name}: {e}")
+        # Check if the user is banned
+        if is_banned(user_id):
+            logging.warning(f"Banned user {button_interaction.user.name} (ID: {user_id}) attempted to join a game.")
 
-                # Respond to the interaction without UI clutter
-                await button_interaction.response.send_message(
-                    "You are banned from joining games through this bot.",
-                    ephemeral=True
+            # Send a DM to inform the user about the ban
+            try:
+                reason = banned_users[user_id]["reason"]
+                expiration = (
+                    f"Your ban will expire <t:{banned_users[user_id]['expiration']}:R>."
+                    if banned_users[user_id]["expiration"] else "Your ban is permanent."
                 )
-                return
+                dm_message = (
+                    f"You are currently banned from joining games through this bot.\n"
+                    f"**Reason:** {reason}\n{expiration}\n\n"
+                    f"For appeals, inform the server admin, reach out to Clay (User ID: 582548598584115211) on Discord, "
+                    f"or email: gaming4tryhards@gmail.com."
+                )
+                await dm_dispatcher.send(button_interaction.user.id, dm_message, kind="ban_notice_join", user=button_interaction.user)
+            except Exception as e:
+                logging.error(f"Failed to DM banned user {button_interaction.user.name}: {e}")
 
-            # Proceed with regular JOIN logic if the user is not banned
-            lfg_uuid = None
-            for uuid, data in active_embeds.items():
-                if any(message.id == button_interaction.message.id for message in data["messages"].values()):
-                    lfg_uuid = uuid
-                    break
+            # Respond to the interaction without UI clutter
+            await button_interaction.response.send_message(
+                "You are banned from joining games through this bot.",
+                ephemeral=True
+            )
+            return
 
-            if not lfg_uuid or lfg_uuid not in active_embeds:
-                await button_interaction.response.send_message("This LFG request is no longer active.", ephemeral=True)
-                return
+        # Proceed with regular JOIN logic if the user is not banned
+        if lfg_uuid not in active_embeds:
+            await button_interaction.response.send_message("This LFG request is no longer active.", ephemeral=True)
+            return
 
-            user_id = button_interaction.user.id
-            display_name = button_interaction.user.name
+        user_id = button_interaction.user.id
+        display_name = button_interaction.user.name
+        data = active_embeds[lfg_uuid]
 
-            if user_id not in active_embeds[lfg_uuid]["players"]:
-                active_embeds[lfg_uuid]["players"][user_id] = display_name
-                await update_embeds(lfg_uuid)
+        if user_id not in data["players"]:
+            if data.get("ready") or len(data["players"]) >= 4:
+                await button_interaction.response.send_message("This game is already full.", ephemeral=True)
+                return
+            add_lfg_player(lfg_uuid, user_id, display_name)
 
-            await button_interaction.response.defer()
-        except discord.errors.NotFound:
-            logging.error("Interaction not found. This might be caused by a timeout or invalid interaction.")
+        await button_interaction.response.defer()
+    except discord.errors.NotFound:
+        logging.error("Interaction not found. This might be caused by a timeout or invalid interaction.")
 
-    async def leave_button_callback(button_interaction: discord.Interaction):
-        try:
-            lfg_uuid = None
-            for uuid, data in active_embeds.items():
-                if any(message.id == button_interaction.message.id for message in data["messages"].values()):
-                    lfg_uuid = uuid
-                    break
+async def leave_lfg(button_interaction: discord.Interaction, lfg_uuid: str):
+    """
+    Handle a LEAVE click on any copy of an LFG embed.
+    """
+    try:
+        if lfg_uuid not in active_embeds:
+            await button_interaction.response.send_message("This LFG request is no longer active.", ephemeral=True)
+            return
 
-            if not lfg_uuid or lfg_uuid not in active_embeds:
-                await button_interaction.response.send_message("This LFG request is no longer active.", ephemeral=True)
-                return
+        user_id = button_interaction.user.id
 
-            user_id = button_interaction.user.id
+        if active_embeds[lfg_uuid].get("ready"):
+            await button_interaction.response.send_message("This game is already ready and can no longer be left here.", ephemeral=True)
+            return
 
-            if user_id in active_embeds[lfg_uuid]["players"]:
-                del active_embeds[lfg_uuid]["players"][user_id]
-                await update_embeds(lfg_uuid)
+        if user_id in active_embeds[lfg_uuid]["players"]:
+            remove_lfg_player(lfg_uuid, user_id)
 
-                # Restart timeout if player count falls below four
-                if len(active_embeds[lfg_uuid]["players"]) < 4:
-                    task = active_embeds[lfg_uuid].get("task")
-                    if not task or task.done():
-                        active_embeds[lfg_uuid]["task"] = asyncio.create_task(lfg_timeout(lfg_uuid))
-                        logging.info(f"Timeout task restarted for LFG UUID {lfg_uuid} as the player count fell below four.")
+        await button_interaction.response.defer()
+    except discord.errors.NotFound:
+        logging.error("Interaction not found. This might be caused by a timeout or invalid interaction.")
 
-            await button_interaction.response.defer()
-        except discord.errors.NotFound:
-            logging.error("Interaction not found. This might be caused by a timeout or invalid interaction.")
+# Define LFGButton Class
+class LFGButton(discord.ui.DynamicItem[discord.ui.Button], template=r"lfg:(?P<action>join|leave):(?P<lfg_uuid>[0-9a-f-]+)"):
+    def __init__(self, action: str, lfg_uuid: str):
+        """
+        Initialize a JOIN or LEAVE button whose custom_id encodes the LFG it belongs to.
+        Registered once as a dynamic item, so clicks are routed without a per-message view
+        and keep working across restarts.
+        :param action: Either 'join' or 'leave'.
+        :param lfg_uuid: UUID of the LFG request.
+        """
+        super().__init__(
+            discord.ui.Button(
+                style=discord.ButtonStyle.success if action == "join" else discord.ButtonStyle.danger,
+                label=action.upper(),
+                custom_id=f"lfg:{action}:{lfg_uuid}"
+            )
+        )
+        self.action = action
+        self.lfg_uuid = lfg_uuid
 
-    join_button = discord.ui.Button(style=discord.ButtonStyle.success, label="JOIN")
-    leave_button = discord.ui.Button(style=discord.ButtonStyle.danger, label="LEAVE")
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["action"], match["lfg_uuid"])
 
-    join_button.callback = join_button_callback
-    leave_button.callback = leave_button_callback
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "join":
+            await join_lfg(interaction, self.lfg_uuid)
+        else:
+            await leave_lfg(interaction, self.lfg_uuid)
 
-    view.add_item(join_button)
-    view.add_item(leave_button)
+client.add_dynamic_items(LFGButton)
 
+# Helper to Create BigLFG View
+def create_lfg_view(lfg_uuid):
+    """
+    Create and return a Discord UI View with JOIN and LEAVE buttons for the BigLFG embed.
+    The view is never stored: clicks are dispatched through the registered LFGButton dynamic item.
+    """
+    view = discord.ui.View(timeout=None)
+    view.add_item(LFGButton("join", lfg_uuid))
+    view.add_item(LFGButton("leave", lfg_uuid))
     return view
 
 # Helper for timeout handling of BigLFG requests
-async def lfg_timeout(lfg_uuid):
+async def expire_lfgs(lfg_uuids):
     """
-    Handle timeout for an LFG embed.
+    Time out every LFG whose deadline passed in one scheduler sweep,
+    editing all of their embed copies in a single concurrent batch.
     """
     try:
-        await asyncio.sleep(45 * 60)  # Wait 45 minutes
-        if lfg_uuid in active_embeds:
-            data = active_embeds.pop(lfg_uuid)
-            for message in data["messages"].values():
-                try:
-                    embed = discord.Embed(title="This request has timed out.", color=discord.Color.red())
-                    await message.edit(embed=embed, view=None)
-                except Exception as e:
-                    logging.error(f"Error updating embed on timeout for LFG UUID {lfg_uuid}: {e}")
+        embed = discord.Embed(title="This request has timed out.", color=discord.Color.red())
+        edits = []
+        for lfg_uuid in lfg_uuids:
+            data = remove_lfg(lfg_uuid)
+            if data is not None:
+                edits.append(edit_lfg_messages(lfg_uuid, data["messages"], embed=embed, view=None))
+        await asyncio.gather(*edits)
+        logging.info(f"Timed out {len(edits)} LFG request(s).")
     except Exception as e:
-        logging.error(f"Error in lfg_timeout for LFG UUID {lfg_uuid}: {e}")
+        logging.error(f"Error in expire_lfgs for LFG UUIDs {lfg_uuids}: {e}")
+
+# Helper to get a TableStream room for a ready game
+async def assign_tablestream_room(lfg_uuid, data):
+    """
+    Store a TableStream room in the LFG data, taking a pre-created room from the pool
+    and only creating one live if the pool is empty.
+    Concurrent updates of the same LFG share one assignment, so a game never gets two rooms.
+    """
+    async def assign():
+        if "game_link" in data:
+            return  # Assigned by an update that finished just before this one started
+        room = tablestream_pool.take()
+        if room is not None:
+            logging.info(f"Assigned a pooled Table Stream room to LFG UUID {lfg_uuid}.")
+            game_link, game_password = room
+        else:
+            logging.info(f"Table Stream room pool is empty; generating a room live for LFG UUID {lfg_uuid}...")
+            game_link, game_password = await generate_tablestream_link({"id": str(uuid.uuid4())}, GameFormat.PAUPER_EDH, 4)
+
+        if game_link:
+            data["game_link"] = game_link  # Store the generated game link
+            data["game_password"] = game_password  # Store the password
+        else:
+            logging.error("Failed to generate Table Stream link.")
+            data["game_link"] = "Error generating game link"
+            data["game_password"] = None
+
+    await tablestream_client.single_flight(lfg_uuid, assign)
 
 # Helper to generate TableStream link
 async def generate_tablestream_link(game_data: dict, game_format: GameFormat, player_count: int) -> tuple[str | None, str | None]:
     """
     Generate a TableStream link using the provided game data, format, and player count.
     """
-    try:
-        logging.info(f"Generating TableStream link with game_data: {game_data}, game_format: {game_format}, player_count: {player_count}")
-
-        # API setup
-        api_url = "https://api.table-stream.com/create-room"
-        token_bearer = os.environ.get("TABLESTREAM_BEARER_TOKEN")
-        if not token_bearer:
-            logging.error("Bearer token for TableStream API is missing!")
-            return None, None
-
-        headers = {
-            "Authorization": f"Bearer {token_bearer}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "roomName": f"{game_data['id']} Pauper EDH Room",
-            "gameType": "MTGCommander",
-            "maxPlayers": player_count,
-            "private": True,
-            "initialScheduleTTLInSeconds": 3600  # 1 hour
-        }
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(api_url, json=payload, headers=headers) as response:
-                if response.status == 201:  # HTTP Created
-                    data = await response.json()
-                    room_url = data.get("room", {}).get("roomUrl")
-                    password = data.get("room", {}).get("password")
-                    logging.info(f"Successfully generated TableStream link: {room_url}")
-                    return room_url, password
-                else:
-                    error = await response.json()
-                    logging.error(f"Failed to generate TableStream link. Status: {response.status}, Error: {error}")
-                    return None, None
-    except Exception as e:
-        logging.error(f"Error while generating TableStream link: {e}")
-        return None, None
+    logging.info(f"Generating TableStream link with game_data: {game_data}, game_format: {game_format}, player_count: {player_count}")
+    return await tablestream_client.create_room(
+        room_name=f"{game_data['id']} Pauper EDH Room",
+        game_type="MTGCommander",
+        max_players=player_count,
+        ttl=TABLESTREAM_ROOM_TTL
+    )
 
 # -------------------------------------------------------------------------
 # Event Handlers
@@ -712,12 +2533,23 @@ async def on_ready():
     # Initialize aiohttp session
     await initialize_aiohttp_session()
 
+    # Start the relay worker pool, the LFG timeout and ban expiration sweepers, relay store compaction and the room pool refill
+    start_relay_workers()
+    lfg_timeouts.start()
+    ban_expirations.start()
+    relay_store.start()
+    tablestream_pool.start()
+
     # Reload configurations from persistent storage
     global WEBHOOK_URLS, CHANNEL_FILTERS
-    WEBHOOK_URLS = load_webhook_data()
-    CHANNEL_FILTERS = load_channel_filters()
+    await persistence.flush()
+    WEBHOOK_URLS, CHANNEL_FILTERS = await database.run(ConfigStore.load_connections)
+    routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)
     logging.info("Configurations reloaded successfully.")
 
+    # Resume LFG requests that were open before the restart
+    await restore_lfgs()
+
     try:
         # Step 1: Sync global commands
         logging.info("Syncing global commands...")
@@ -734,15 +2566,6 @@ async def on_ready():
     except Exception as e:
         logging.error(f"Critical error during on_ready: {e}")
 
-async def initialize_aiohttp_session():
-    """
-    Initialize a global aiohttp session.
-    """
-    global global_aiohttp_session
-    if global_aiohttp_session is None:
-        global_aiohttp_session = aiohttp.ClientSession()
-        logging.info("Global aiohttp session initialized successfully.")
-
 async def check_registered_commands():
     """
     Debugging function to check which commands are currently registered globally.
@@ -774,28 +2597,34 @@ async def on_message(message):
     if message.author == client.user or message.webhook_id:
         return  # Ignore bot messages and webhook messages
 
+    # Messages from channels outside the network need no further work
+    if not routing_table.is_connected(message.channel.id):
+        return
+
     user_id = str(message.author.id)
 
     # Check if the user is banned
-    if user_id in banned_users:
-        logging.warning(f"Blocked message from banned user {message.author.name} (ID: {user_id}) in {message.channel.name}")
+    if is_banned(user_id):
+        log_sampler.log("banned_message", logging.WARNING, "Blocked message from banned user %s (ID: %s) in %s", message.author.name, user_id, message.channel.name)
 
-        # Delete the message and inform the user (ephemeral error message)
+        # Delete the message and inform the user; repeated notices within the cooldown are collapsed
         try:
             await message.delete()
-            await message.author.send(
+            await dm_dispatcher.send(
+                message.author.id,
                 f"Your message in **{message.guild.name} - {message.channel.name}** was blocked because you are currently banned.\n"
                 f"**Reason:** {banned_users[user_id]['reason']}\n"
                 f"{'Your ban will expire in 3 days.' if banned_users[user_id]['expiration'] else 'This is a permanent ban.'}\n\n"
-                f"For appeals, contact the server admin, or reach out to Clay (User ID: 582548598584115211) on Discord."
+                f"For appeals, contact the server admin, or reach out to Clay (User ID: 582548598584115211) on Discord.",
+                kind="ban_notice_message",
+                user=message.author
             )
         except Exception as e:
             logging.error(f"Failed to block and notify banned user {message.author.name}: {e}")
 
         return  # Prevent relaying of banned messages
 
-    source_channel_id = f'{message.guild.id}_{message.channel.id}'
-    source_filter = str(CHANNEL_FILTERS.get(source_channel_id, 'none'))  # Ensure string type
+    source_filter = routing_table.filter_for(message.channel.id)
 
     # Check if the message is in an *lfg channel and not a slash command
     if source_filter.endswith('lfg') and not message.content.startswith('/'):
@@ -803,153 +2632,108 @@ async def on_message(message):
         await message.channel.send(f"Text messages are not allowed in this channel. Please use slash commands.", delete_after=5)
         return
 
-    if source_channel_id in WEBHOOK_URLS:
-        for destination_channel_id, webhook_data in WEBHOOK_URLS.items():
-            if source_channel_id != destination_channel_id:
-                destination_filter = str(CHANNEL_FILTERS.get(destination_channel_id, 'none'))  # Ensure string type
-                # Only relay text messages to *txt channels
-                if source_filter.endswith('txt') and destination_filter.endswith('txt') and source_filter == destination_filter:
-                    destination_channel = client.get_channel(int(destination_channel_id.split('_')[1]))
-                    if destination_channel:
-                        await relay_text_message(message, destination_channel)
+    # Only relay text messages between *txt channels sharing the same filter
+    if source_filter.endswith('txt'):
+        await relay_queue.submit(PRIORITY_CHAT, lambda: relay_to_destinations(message, source_filter), f"relay of message {message.id}")
 
 @client.event
 async def on_message_edit(before, after):
     """
     Handles edits to messages and propagates updates across all relayed copies.
     """
-    await propagate_text_edit(before, after)
+    if after.author == client.user or after.webhook_id or not routing_table.is_connected(after.channel.id):
+        return  # Our own messages (e.g. LFG embeds) and webhook messages are never relayed originals
+    await relay_queue.submit(
+        PRIORITY_CHAT,
+        lambda: propagate_text_edit(before.id, after.author.name, after.guild.name, after.content),
+        f"edit of message {before.id}"
+    )
+
+@client.event
+async def on_raw_message_edit(payload):
+    """
+    Propagates edits to messages that are no longer in the message cache (e.g. sent before a restart).
+    """
+    if payload.cached_message is not None:
+        return  # Handled by on_message_edit
+    if not routing_table.is_connected(payload.channel_id):
+        return
+    author = payload.data.get("author")
+    content = payload.data.get("content")
+    guild = client.get_guild(payload.guild_id) if payload.guild_id else None
+    if author is None or content is None or guild is None:
+        return  # Not a content edit (e.g. an embed being resolved)
+    if author.get("id") == str(client.user.id) or payload.data.get("webhook_id"):
+        return  # Our own messages (e.g. LFG embeds) and webhook messages are never relayed originals
+    await relay_queue.submit(
+        PRIORITY_CHAT,
+        lambda: propagate_text_edit(payload.message_id, author["username"], guild.name, content),
+        f"edit of message {payload.message_id}"
+    )
 
 @client.event
 async def on_message_delete(message):
     """
     Handles deletions of messages and ensures all related relayed copies are also deleted.
     """
-    try:
-        for original_id, data in list(message_map.items()):
-            if str(message.id) == original_id:
-                # Delete all relayed messages
-                logging.info(f"Deleting relayed messages for original message ID: {message.id}")
-                for relayed in data["relayed_messages"]:
-                    try:
-                        channel = client.get_channel(int(relayed["channel_id"]))
-                        if not channel:
-                            logging.warning(f"Channel {relayed['channel_id']} not accessible. Skipping.")
-                            continue
-
-                        target_message = await channel.fetch_message(int(relayed["message_id"]))
-                        await target_message.delete()
-                        logging.info(f"Deleted relayed message ID: {relayed['message_id']} in channel {relayed['channel_id']}")
-                    except Exception as e:
-                        logging.error(f"Error deleting message ID {relayed['message_id']}: {e}")
-                del message_map[original_id]  # Remove from map after deletion
-                return
-        
-        logging.warning(f"Original message {message.id} not found in message_map. Cannot propagate deletion.")
-    except Exception as e:
-        logging.error(f"Error in on_message_delete: {e}")
+    await handle_message_delete(message.id, message.channel.id)
 
 @client.event
-async def on_reaction_add(reaction, user):
+async def on_raw_message_delete(payload):
     """
-    Handle and propagate reactions across all associated messages.
+    Handles deletions of messages that are no longer in the message cache (e.g. sent before a restart).
     """
-    if user.bot:
-        return  # Ignore bot reactions
+    if payload.cached_message is None:
+        await handle_message_delete(payload.message_id, payload.channel_id)
 
+async def handle_message_delete(message_id, channel_id):
+    """
+    Drop a deleted LFG embed copy, or propagate the deletion of an original message to its relayed copies.
+    """
     try:
-        logging.info(f"Reaction {reaction.emoji} added by {user.name} in channel {reaction.message.channel.id}")
-
-        # Locate the original message ID
-        for original_id, data in message_map.items():
-            relayed_messages = data["relayed_messages"]
-            if any(str(reaction.message.id) == relayed["message_id"] for relayed in relayed_messages) or str(reaction.message.id) == original_id:
-                logging.info(f"Match found for message ID: {reaction.message.id} (Original ID: {original_id})")
-
-                # Propagate the reaction to all relayed messages
-                for relayed in relayed_messages:
-                    if str(reaction.message.id) != relayed["message_id"]:  # Skip the triggering message
-                        try:
-                            channel = client.get_channel(int(relayed["channel_id"]))
-                            if not channel:
-                                logging.warning(f"Channel {relayed['channel_id']} not accessible. Skipping.")
-                                continue
-
-                            message = await channel.fetch_message(int(relayed["message_id"]))
-                            await message.add_reaction(reaction.emoji)
-                            logging.info(f"Propagated reaction {reaction.emoji} to message ID: {relayed['message_id']} in channel {relayed['channel_id']}")
-                        except Exception as e:
-                            logging.error(f"Error propagating reaction to message ID {relayed['message_id']}: {e}")
-
-                # Add reaction to the original message if not already triggered
-                if str(reaction.message.id) != original_id:
-                    try:
-                        original_channel = client.get_channel(int(data["original_channel_id"]))
-                        if original_channel:
-                            original_message = await original_channel.fetch_message(int(original_id))
-                            await original_message.add_reaction(reaction.emoji)
-                            logging.info(f"Propagated reaction {reaction.emoji} to original message ID: {original_id}")
-                    except discord.NotFound:
-                        logging.warning(f"Original message {original_id} not found. Skipping reaction propagation to it.")
-                    except Exception as e:
-                        logging.error(f"Error propagating reaction to the original message ID {original_id}: {e}")
+        # A deleted LFG embed copy is dropped so later updates skip it
+        lfg_uuid = find_lfg(message_id)
+        if lfg_uuid is not None:
+            drop_lfg_message(lfg_uuid, message_id)
+            return
 
-                return  # Exit after processing the match
+        # Only deletions of the original message are propagated
+        if not routing_table.is_connected(channel_id):
+            return
+        # Relays of it still queued or in flight discard their copies instead of recording them
+        message_map.mark_deleted(str(message_id))
+        original_id, data = await resolve_relay(message_id)
+        if original_id != str(message_id):
+            logging.debug("Original message %s not found in message_map. Cannot propagate deletion.", message_id)
+            return
 
-        logging.warning(f"Message ID {reaction.message.id} not found in message_map. Cannot propagate reactions.")
+        # Remove from map (and index) before deleting so the copies' own delete events are ignored
+        message_map.remove(original_id)
+        relay_store.delete(original_id)
+        reaction_coalescer.forget(original_id)
+        await relay_queue.submit(PRIORITY_LFG_UPDATE, lambda: propagate_text_delete(original_id, data), f"deletion of message {original_id}")
     except Exception as e:
-        logging.error(f"Error in on_reaction_add: {e}")
+        logging.error(f"Error in on_message_delete: {e}")
 
 @client.event
-async def on_reaction_remove(reaction, user):
+async def on_raw_reaction_add(payload):
     """
-    Handles removing reactions from a message and propagates the removal to all relayed copies.
+    Handle and propagate reactions across all associated messages.
+    Raw events also cover messages that are no longer in the message cache.
     """
-    if user.bot:
-        return  # Ignore bot reactions
-
-    try:
-        logging.info(f"Processing reaction {reaction.emoji} removed by {user.name} from message ID: {reaction.message.id}")
-
-        # Locate the original message ID
-        for original_id, data in message_map.items():
-            relayed_messages = data["relayed_messages"]
-            if any(str(reaction.message.id) == relayed["message_id"] for relayed in relayed_messages) or str(reaction.message.id) == original_id:
-                logging.info(f"Match found for message ID: {reaction.message.id} (Original ID: {original_id})")
-
-                # Propagate the reaction removal to all associated messages
-                for relayed in relayed_messages:
-                    if str(reaction.message.id) != relayed["message_id"]:  # Skip the triggering message
-                        try:
-                            channel = client.get_channel(int(relayed["channel_id"]))
-                            if not channel:
-                                logging.warning(f"Channel {relayed['channel_id']} not accessible. Skipping.")
-                                continue
-
-                            message = await channel.fetch_message(int(relayed["message_id"]))
-                            await message.remove_reaction(reaction.emoji, user)
-                            logging.info(f"Propagated reaction removal {reaction.emoji} from message ID: {relayed['message_id']} in channel {relayed['channel_id']}")
-                        except Exception as e:
-                            logging.error(f"Error propagating reaction removal to message ID {relayed['message_id']}: {e}")
-
-                # Remove reaction from the original message if not already triggered
-                if str(reaction.message.id) != original_id:
-                    try:
-                        original_channel = client.get_channel(int(data["original_channel_id"]))
-                        if original_channel:
-                            original_message = await original_channel.fetch_message(int(original_id))
-                            await original_message.remove_reaction(reaction.emoji, user)
-                            logging.info(f"Propagated reaction removal {reaction.emoji} to original message ID: {original_id}")
-                    except discord.NotFound:
-                        logging.warning(f"Original message {original_id} not found. Skipping reaction removal propagation to it.")
-                    except Exception as e:
-                        logging.error(f"Error propagating reaction removal to the original message ID {original_id}: {e}")
-
-                return  # Exit after processing the match
+    if payload.user_id == client.user.id or (payload.member is not None and payload.member.bot):
+        return  # Ignore bot reactions (including our own mirrors)
+    await record_reaction(payload.channel_id, payload.message_id, payload.emoji, payload.user_id, added=True)
 
-        logging.warning(f"Message ID {reaction.message.id} not found in message_map. Cannot propagate reaction removals.")
-    except Exception as e:
-        logging.error(f"Error in on_reaction_remove: {e}")
+@client.event
+async def on_raw_reaction_remove(payload):
+    """
+    Handles removing reactions from a message and propagates the removal to all relayed copies.
+    """
+    user = client.get_user(payload.user_id)
+    if payload.user_id == client.user.id or (user is not None and user.bot):
+        return  # Ignore bot reactions (including our own mirrors)
+    await record_reaction(payload.channel_id, payload.message_id, payload.emoji, payload.user_id, added=False)
 
 @client.event
 async def on_guild_join(guild):
@@ -962,6 +2746,7 @@ async def on_guild_join(guild):
         await guild.leave()
     else:
         logging.info(f"Joined new server: {guild.name} (ID: {guild.id})")
+        routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)  # Re-resolve routes into the new server
 
 @client.event
 async def on_guild_remove(guild):
@@ -969,6 +2754,7 @@ async def on_guild_remove(guild):
     Handles bot removal from a guild, ensuring any associated data or configurations are cleaned up.
     """
     logging.info(f"Bot removed from server: {guild.name} (ID: {guild.id})")
+    routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)  # Drop routes into the removed server
     # Further cleanup logic (if required) can be added here
 
 # -------------------------------------------------------------------------
@@ -1021,8 +2807,8 @@ async def setchannel(interaction: discord.Interaction, channel: discord.TextChan
     webhook = await channel.create_webhook(name="Cross-Server Bot Webhook")
     WEBHOOK_URLS[f'{interaction.guild.id}_{channel.id}'] = {'url': webhook.url, 'id': webhook.id}
     CHANNEL_FILTERS[f'{interaction.guild.id}_{channel.id}'] = filter  # Store filter as a string
-    save_webhook_data()
-    save_channel_filters()
+    save_connection(f'{interaction.guild.id}_{channel.id}')
+    routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)
 
     logging.info(f"Admin {interaction.user.name} set {channel.mention} as a cross-server channel with filter '{filter}'")
     await interaction.response.send_message(f"Cross-server communication channel set to {channel.mention} with filter '{filter}'.", ephemeral=True)
@@ -1042,7 +2828,8 @@ async def disconnect(interaction: discord.Interaction, channel: discord.TextChan
     channel_id = f'{interaction.guild.id}_{channel.id}'
     if channel_id in WEBHOOK_URLS:
         del WEBHOOK_URLS[channel_id]
-        save_webhook_data()
+        save_connection(channel_id)
+        routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)
 
         logging.info(f"Admin {interaction.user.name} disconnected {channel.mention} from cross-server communication.")
         await interaction.response.send_message(f"Disconnected {channel.mention} from cross-server communication.", ephemeral=True)
@@ -1084,10 +2871,11 @@ async def updateconfig(interaction: discord.Interaction):
     try:
         await interaction.response.defer(ephemeral=True)
 
-        # Reload configuration files
+        # Reload configuration from the database, after writing out any pending changes
         global WEBHOOK_URLS, CHANNEL_FILTERS
-        WEBHOOK_URLS = load_webhook_data()
-        CHANNEL_FILTERS = load_channel_filters()
+        await persistence.flush()
+        WEBHOOK_URLS, CHANNEL_FILTERS = await database.run(ConfigStore.load_connections)
+        routing_table.rebuild(WEBHOOK_URLS, CHANNEL_FILTERS)
 
         # Resynchronize the command tree
         await client.tree.sync()
@@ -1120,18 +2908,13 @@ async def addspelltable(interaction: discord.Interaction, link: str):
     )
     embed.set_author(name="PDH LFG Bot", icon_url=IMAGE_URL)
 
-    source_channel_id = f'{interaction.guild.id}_{interaction.channel.id}'
-    source_filter = str(CHANNEL_FILTERS.get(source_channel_id, 'none'))
+    source_filter = routing_table.filter_for(interaction.channel.id)
 
     # Distribute the embed to all connected channels with the same filter
     sent_to_channels = 0
-    for destination_channel_id, webhook_data in WEBHOOK_URLS.items():
-        destination_filter = str(CHANNEL_FILTERS.get(destination_channel_id, 'none'))
-        if source_filter == destination_filter:
-            destination_channel = client.get_channel(int(destination_channel_id.split('_')[1]))
-            if destination_channel:
-                await destination_channel.send(embed=embed)
-                sent_to_channels += 1
+    for destination_channel in routing_table.destinations(source_filter):
+        await destination_channel.send(embed=embed)
+        sent_to_channels += 1
 
     # Respond to the user with success or failure
     if sent_to_channels > 0:
@@ -1259,7 +3042,7 @@ async def biglfg(interaction: discord.Interaction):
     """
     # Check if the user is banned
     user_id = str(interaction.user.id)
-    if user_id in banned_users:
+    if is_banned(user_id):
         logging.warning(f"Banned user {interaction.user.name} (ID: {user_id}) attempted to use /biglfg.")
         await interaction.response.send_message(
             "You are currently banned from using this command. Please contact an admin if you believe this is an error.",
@@ -1267,9 +3050,12 @@ async def biglfg(interaction: discord.Interaction):
         )
         # DM the user to notify them of their restriction
         try:
-            await interaction.user.send(
+            await dm_dispatcher.send(
+                interaction.user.id,
                 "You attempted to use the /biglfg command but are currently banned from using it. "
-                "Please contact an admin to resolve this issue."
+                "Please contact an admin to resolve this issue.",
+                kind="ban_notice_biglfg",
+                user=interaction.user
             )
         except Exception as e:
             logging.error(f"Failed to send DM to banned user {interaction.user.name} (ID: {user_id}): {e}")
@@ -1282,8 +3068,7 @@ async def biglfg(interaction: discord.Interaction):
         # Generate a unique UUID for this LFG instance
         lfg_uuid = str(uuid.uuid4())
 
-        source_channel_id = f'{interaction.guild.id}_{interaction.channel.id}'
-        source_filter = str(CHANNEL_FILTERS.get(source_channel_id, 'none'))  # Ensure string type
+        source_filter = routing_table.filter_for(interaction.channel.id)
 
         # Create the initial embed
         embed = discord.Embed(
@@ -1299,28 +3084,43 @@ async def biglfg(interaction: discord.Interaction):
         embed.set_thumbnail(url=IMAGE_URL)  # Add the image as a thumbnail
         embed.add_field(name="Players:", value=f"1. {interaction.user.name}", inline=False)
 
-        # Track the BigLFG embed
-        sent_messages = {}
-        for destination_channel_id, webhook_data in WEBHOOK_URLS.items():
-            destination_filter = str(CHANNEL_FILTERS.get(destination_channel_id, 'none'))  # Ensure string type
-            # Only send embeds to *lfg channels
-            if source_filter.endswith('lfg') and destination_filter.endswith('lfg') and source_filter == destination_filter:
-                destination_channel = client.get_channel(int(destination_channel_id.split('_')[1]))
-                if destination_channel:
-                    # Introduce a small delay to prevent rate-limiting
-                    await asyncio.sleep(RATE_LIMIT_DELAY)
-                    sent_message = await destination_channel.send(embed=embed, view=create_lfg_view())
-                    if sent_message:
-                        sent_messages[destination_channel_id] = sent_message
-
-        if sent_messages:
-            active_embeds[lfg_uuid] = {
-                "players": {interaction.user.id: interaction.user.name},
-                "messages": sent_messages,
-                "task": asyncio.create_task(lfg_timeout(lfg_uuid)),
-            }
-            await interaction.followup.send("BigLFG request sent successfully!", ephemeral=True)
+        # Only send embeds to *lfg channels sharing the same filter
+        destinations = routing_table.destinations(source_filter) if source_filter.endswith('lfg') else []
+
+        # Track the BigLFG embed before broadcasting, so early JOIN clicks find it
+        register_lfg(lfg_uuid, {
+            "players": {interaction.user.id: interaction.user.name},
+            "messages": {},
+            "expires_at": int(time.time()) + LFG_TIMEOUT,
+            "version": 0,
+            "flushed_version": 0,  # The initial embed already shows version 0
+        })
+
+        async def broadcast(destination_channel):
+            sent_message = await relay_lfg_embed(embed, lfg_uuid, destination_channel)
+            if sent_message and lfg_uuid in active_embeds:
+                add_lfg_message(lfg_uuid, routing_table.key_for(destination_channel.id), sent_message)
+
+        # Send to every channel at once; only real rate limits delay a channel
+        started_at = time.monotonic()
+        await asyncio.gather(*[
+            relay_lanes.submit(destination_channel.id, lambda destination_channel=destination_channel: broadcast(destination_channel))
+            for destination_channel in destinations
+        ])
+        elapsed = time.monotonic() - started_at
+
+        data = active_embeds.get(lfg_uuid)
+        if data and data["messages"]:
+            logging.info(f"BigLFG {lfg_uuid} broadcast to {len(data['messages'])}/{len(destinations)} channels in {elapsed:.2f} seconds.")
+            # Players who joined mid-broadcast are not shown on the copies sent before them yet
+            if len(data["players"]) > 1:
+                mark_lfg_dirty(lfg_uuid)
+            await interaction.followup.send(
+                f"BigLFG request sent successfully to {len(data['messages'])} of {len(destinations)} channel(s) in {elapsed:.2f} seconds!",
+                ephemeral=True
+            )
         else:
+            remove_lfg(lfg_uuid)
             await interaction.followup.send("Failed to send BigLFG request to any channels.", ephemeral=True)
     except Exception as e:
         logging.error(f"Error in BigLFG command: {e}")
@@ -1340,7 +3140,7 @@ async def banuser(interaction: discord.Interaction, user: discord.User, reason:
     user_id = str(user.id)
     user_name = user.name
 
-    # Determine if the user already served a temporary ban
+    # Determine if the user already served (or is serving) a temporary ban
     if user_id in banned_users and banned_users[user_id]["expiration"] is not None:
         ban_expiration = None  # Permanent ban
         ban_type = "Permanent"
@@ -1354,7 +3154,11 @@ async def banuser(interaction: discord.Interaction, user: discord.User, reason:
         "reason": reason,
         "expiration": ban_expiration
     }
-    save_banned_users()
+    save_ban(user_id)
+    if ban_expiration is None:
+        ban_expirations.cancel(user_id)
+    else:
+        ban_expirations.schedule(user_id, ban_expiration)
 
     # Log and send confirmation
     logging.info(f"{ban_type} ban issued: {user_name} (ID: {user_id}) - Reason: {reason}")
@@ -1369,7 +3173,7 @@ async def banuser(interaction: discord.Interaction, user: discord.User, reason:
             f"For appeals, inform the server admin, reach out to Clay (User ID: 582548598584115211) on Discord, "
             f"or email: gaming4tryhards@gmail.com."
         )
-        await user.send(dm_message)
+        await dm_dispatcher.send(user.id, dm_message, user=user)
     except Exception as e:
         logging.error(f"Failed to send ban DM to {user_name}: {e}")
 
@@ -1386,20 +3190,21 @@ async def unbanuser(interaction: discord.Interaction, user: discord.User):
 
     user_id = str(user.id)
 
-    if user_id not in banned_users:
+    if not is_banned(user_id):
         await interaction.response.send_message(f"{user.mention} is not currently banned.", ephemeral=True)
         return
 
     # Remove user from banned list
     del banned_users[user_id]
-    save_banned_users()
+    save_ban(user_id)
+    ban_expirations.cancel(user_id)
 
     logging.info(f"User {user.name} (ID: {user_id}) has been unbanned.")
     await interaction.response.send_message(f"{user.mention} has been unbanned.", ephemeral=True)
 
     # DM the unbanned user
     try:
-        await user.send("You have been unbanned and can now interact in bot-controlled channels again.")
+        await dm_dispatcher.send(user.id, "You have been unbanned and can now interact in bot-controlled channels again.", user=user)
     except Exception as e:
         logging.error(f"Failed to send unban DM to {user.name}: {e}")
 
@@ -1413,13 +3218,14 @@ async def listbans(interaction: discord.Interaction):
         await interaction.response.send_message("You do not have permission to use this command.", ephemeral=True)
         return
 
-    if not banned_users:
+    active_bans = {user_id: data for user_id, data in banned_users.items() if is_banned(user_id)}
+    if not active_bans:
         await interaction.response.send_message("No users are currently banned.", ephemeral=True)
         return
 
     # Generate a ban list message
     ban_list = "**Banned Users:**\n"
-    for user_id, data in banned_users.items():
+    for user_id, data in active_bans.items():
         user_name = data.get("name", "Unknown")  # Default to 'Unknown' if the name key is missing
         expiration = f" (Expires: <t:{data['expiration']}:R>)" if data["expiration"] else " (Permanent)"
         ban_list += f"- **{user_name}** (ID: {user_id}) - **Reason:** {data.get('reason', 'No reason provided')}{expiration}\n"
@@ -1472,7 +3278,6 @@ async def listadmins(interaction: discord.Interaction):
     Display all trusted admin user IDs.
     """
     try:
-        trusted_admins = load_trusted_admins()
         if trusted_admins:
             admin_list = "\n".join([f"- <@{admin_id}>" for admin_id in trusted_admins])
             await interaction.response.send_message(f"Trusted Admins:\n{admin_list}", ephemeral=True)
@@ -1486,18 +3291,49 @@ async def listadmins(interaction: discord.Interaction):
 # Message Relay Loop
 # -------------------------------------------------------------------------
 
-async def message_relay_loop():
+async def message_relay_loop(worker_id):
     """
-    Main loop for handling message propagation across connected channels.
-    Implements rate-limit-aware handling for all queued tasks.
+    Relay worker: serves queued relay jobs by priority class.
+    Gateway event handlers only queue work, so they return immediately.
     """
     while True:
+        priority, _, job, description = await relay_queue.get()
         try:
-            # Introduce a small delay to prevent excessive API calls
-            await asyncio.sleep(RATE_LIMIT_DELAY)
-            # Placeholder for additional logic if message queuing or advanced relay is added
+            await job()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logging.error(f"Error in message relay loop: {e}")
+            logging.error(f"Error in message relay loop (worker {worker_id}) processing {description}: {e}")
+        finally:
+            relay_queue.task_done()
+
+def dump_relay_state():
+    """
+    Log relay state on demand (send SIGUSR1 to the process).
+    Counters are logged at INFO; the full relay map is only serialized when DEBUG is enabled.
+    """
+    logging.info(
+        "Relay state: map=%s, queue depth=%d, shed jobs=%d, active lanes=%d, reaction events=%d, rate limit wait=%.2fs",
+        message_map.stats(), relay_queue.depth(), relay_queue.shed_jobs, len(relay_lanes.lanes),
+        reaction_coalescer.events, rate_limit_scheduler.total_wait
+    )
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Relay map dump: %s", json.dumps(dict(message_map.entries), indent=4))
+
+def start_relay_workers():
+    """
+    Start the relay worker pool once; on_ready may fire again after reconnects.
+    """
+    if relay_workers:
+        return
+    for worker_id in range(RELAY_WORKERS):
+        relay_workers.append(asyncio.create_task(message_relay_loop(worker_id)))
+    logging.info(f"Started {RELAY_WORKERS} relay workers.")
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, dump_relay_state)
+    except (NotImplementedError, AttributeError):
+        pass  # Signals are not available on this platform
 
 # -------------------------------------------------------------------------
 # Start the Bot
@@ -1507,22 +3343,27 @@ async def start_bot():
     """
     Asynchronous function to start the bot with rate-limit handling.
     """
-    while True:
-        try:
-            logging.info("Starting the bot...")
-            await client.start(TOKEN)
-            break  # Exit the loop if successful
-        except discord.HTTPException as e:
-            if e.status == 429:
-                retry_after = int(e.response.headers.get("Retry-After", 1)) / 1000
-                logging.critical(f"Rate limit hit during bot start! Retrying after {retry_after} seconds.")
-                await asyncio.sleep(retry_after)
-            else:
-                logging.critical(f"Discord API error while starting the bot: {e}")
+    try:
+        while True:
+            try:
+                logging.info("Starting the bot...")
+                await client.start(TOKEN)
+                break  # Exit the loop if successful
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    retry_after = int(e.response.headers.get("Retry-After", 1)) / 1000
+                    logging.critical(f"Rate limit hit during bot start! Retrying after {retry_after} seconds.")
+                    await asyncio.sleep(retry_after)
+                else:
+                    logging.critical(f"Discord API error while starting the bot: {e}")
+                    break
+            except Exception as e:
+                logging.critical(f"Critical error while starting the bot: {e}")
                 break
-        except Exception as e:
-            logging.critical(f"Critical error while starting the bot: {e}")
-            break
+    finally:
+        await close_aiohttp_session()
+        await persistence.flush()  # Write out any pending state changes
+        await asyncio.to_thread(database.close)  # Flush queued database writes
 
 
 if __name__ == "__main__":
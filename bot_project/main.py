@@ -1,7 +1,9 @@
+import asyncio
 import discord
 from discord.ext import commands
 import os
 from config.settings import settings
+from utils.retry_utils import close_retry_client
 
 intents = discord.Intents.default()
 intents.message_content = True  # Ensure the bot can read message content
@@ -38,6 +40,13 @@ async def on_command_error(ctx, error):
         await ctx.send(f"An error occurred: {error}")
         print(f"Error: {error}")
 
-# Start the bot
+# Start the bot; the pooled HTTP client is closed on shutdown
+async def main():
+    async with bot:
+        try:
+            await bot.start(settings.DISCORD_BOT_TOKEN)
+        finally:
+            await close_retry_client()
+
 if __name__ == "__main__":
-    bot.run(settings.DISCORD_BOT_TOKEN)
+    asyncio.run(main())
@@ -1,19 +1,20 @@
 from discord import TextChannel, VoiceChannel
-from utils.json_storage_utils import read_json_file, write_json_file
+from utils.json_storage_utils import get_cached_store
 
 WEBHOOK_DATA_FILE = "var/webhook_data.json"
 
+webhook_data_store = get_cached_store(WEBHOOK_DATA_FILE)
+
 def get_channel_webhook_data(channel_id: int) -> dict:
-    data = read_json_file(WEBHOOK_DATA_FILE)
-    return data.get(str(channel_id), {})
+    return webhook_data_store.get().get(str(channel_id), {})
 
 def save_channel_webhook(channel_id: int, webhook_url: str) -> None:
-    data = read_json_file(WEBHOOK_DATA_FILE)
+    data = webhook_data_store.get_for_update()
     data[str(channel_id)] = {"webhook_url": webhook_url}
-    write_json_file(WEBHOOK_DATA_FILE, data)
+    webhook_data_store.write(data)
 
 def remove_channel_webhook(channel_id: int) -> None:
-    data = read_json_file(WEBHOOK_DATA_FILE)
+    data = webhook_data_store.get_for_update()
     if str(channel_id) in data:
         del data[str(channel_id)]
-        write_json_file(WEBHOOK_DATA_FILE, data)
+        webhook_data_store.write(data)
@@ -1,4 +1,5 @@
-import json
+import asyncio
+import time
 from typing import Any
 from aiohttp.client_exceptions import ClientError
 from utils.retry_utils import fetch_with_retries
@@ -7,7 +8,29 @@ from config.settings import settings
 
 logger = get_logger(__name__)
 
-async def generate_tablestream_link(game: dict[str, Any]) -> tuple[str | None, str | None]:
+# Circuit breaker: after this many consecutive failures, calls fail fast until the cooldown ends
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+
+_failures = 0
+_open_until = 0.0
+_in_flight: dict[Any, asyncio.Task] = {}  # Game ID -> room creation shared by concurrent callers
+
+def _record(success: bool):
+    global _failures, _open_until
+    if success:
+        _failures = 0
+        return
+    _failures += 1
+    if _failures >= BREAKER_THRESHOLD:
+        _open_until = time.monotonic() + BREAKER_COOLDOWN
+        logger.warning(f"TableStream circuit breaker open for {BREAKER_COOLDOWN} seconds after {_failures} consecutive failures.")
+
+async def _create_room(game: dict[str, Any]) -> tuple[str | None, str | None]:
+    if _failures >= BREAKER_THRESHOLD and time.monotonic() < _open_until:
+        logger.warning("TableStream circuit breaker is open; skipping room creation.")
+        return None, None
+
     headers = {
         "user-agent": "bot/1.0",
         "Authorization": f"Bearer: {settings.TABLESTREAM_AUTH_KEY}",
@@ -28,11 +51,21 @@ async def generate_tablestream_link(game: dict[str, Any]) -> tuple[str | None, s
             json_data=ts_args,
         )
         room = response.get("room", {})
+        _record(True)
         return room.get("roomUrl"), room.get("password")
 
-    except ClientError as ex:
+    except (ClientError, asyncio.TimeoutError) as ex:
         logger.warning(f"TableStream API failure: {ex}")
-        return None, None
     except Exception as ex:
         logger.error(f"Unexpected error: {ex}")
-        return None, None
+    _record(False)
+    return None, None
+
+async def generate_tablestream_link(game: dict[str, Any]) -> tuple[str | None, str | None]:
+    # Concurrent requests for the same game share one room
+    task = _in_flight.get(game["id"])
+    if task is None:
+        task = asyncio.ensure_future(_create_room(game))
+        _in_flight[game["id"]] = task
+        task.add_done_callback(lambda _: _in_flight.pop(game["id"], None))
+    return await asyncio.shield(task)
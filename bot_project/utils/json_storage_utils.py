@@ -1,5 +1,8 @@
+import copy
 import json
-from typing import Any
+import os
+import time
+from typing import Any, Callable
 
 def read_json_file(file_path: str) -> Any:
     try:
@@ -14,3 +17,62 @@ def read_json_file(file_path: str) -> Any:
 def write_json_file(file_path: str, data: Any) -> None:
     with open(file_path, "w") as file:
         json.dump(data, file, indent=4)
+
+def _file_mtime(file_path: str) -> int | None:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+class CachedJsonStore:
+    """
+    Parsed contents of a JSON file kept in memory.
+    The file is re-read only after it changes on disk (checked by mtime at most once per
+    `check_interval` seconds); the store's own writes update the cache directly.
+    Derived views (sets, dicts) are built once per version of the data.
+    """
+
+    def __init__(self, file_path: str, check_interval: float = 1.0):
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._data: Any = None
+        self._mtime: int | None = None
+        self._checked_at = float("-inf")
+        self._views: dict[str, Any] = {}
+
+    def get(self, refresh: bool = False) -> Any:
+        # Pass refresh=True before a read-modify-write so external edits are never overwritten
+        now = time.monotonic()
+        if self._data is None or refresh or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            mtime = _file_mtime(self.file_path)
+            if self._data is None or mtime != self._mtime:
+                self._data = read_json_file(self.file_path)
+                self._mtime = mtime
+                self._views.clear()
+        return self._data
+
+    def get_for_update(self) -> Any:
+        # A fresh private copy for read-modify-write; the cache only changes once write() succeeds
+        return copy.deepcopy(self.get(refresh=True))
+
+    def view(self, name: str, build: Callable[[Any], Any]) -> Any:
+        data = self.get()
+        if name not in self._views:
+            self._views[name] = build(data)
+        return self._views[name]
+
+    def write(self, data: Any) -> None:
+        write_json_file(self.file_path, data)  # Raises before the cache is touched
+        self._data = data
+        self._mtime = _file_mtime(self.file_path)
+        self._checked_at = time.monotonic()
+        self._views.clear()
+
+_stores: dict[str, CachedJsonStore] = {}
+
+def get_cached_store(file_path: str) -> CachedJsonStore:
+    # One store per file, so services sharing a file also share its cache
+    if file_path not in _stores:
+        _stores[file_path] = CachedJsonStore(file_path)
+    return _stores[file_path]
@@ -1,14 +1,27 @@
+import atexit
 import logging
+import logging.handlers
+import queue
+
+# Configure logging for the bot.
+# Records are handed to a queue and written by a background thread,
+# so file and console I/O never block the event loop.
+_log_queue = queue.SimpleQueue()
+
+_formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+_file_handler = logging.FileHandler("var/bot.log")  # Log to a file
+_file_handler.setFormatter(_formatter)
+_stream_handler = logging.StreamHandler()           # Also log to console
+_stream_handler.setFormatter(_formatter)
+
+_listener = logging.handlers.QueueListener(_log_queue, _file_handler, _stream_handler, respect_handler_level=True)
 
-# Configure logging for the bot
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.FileHandler("var/bot.log"),  # Log to a file
-        logging.StreamHandler()              # Also log to console
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
+_listener.start()
+atexit.register(_listener.stop)
 
 def get_logger(name: str):
     return logging.getLogger(name)
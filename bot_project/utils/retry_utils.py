@@ -1,11 +1,25 @@
-from aiohttp import ClientSession
-from aiohttp_retry import RetryClient, ExponentialRetry
+from aiohttp import ClientSession, ClientTimeout
+from aiohttp_retry import RetryClient, JitterRetry
 
-def get_retry_client(retries=5, base_delay=1, max_delay=16):
-    retry_options = ExponentialRetry(attempts=retries, start_timeout=base_delay, max_timeout=max_delay)
-    return RetryClient(raise_for_status=False, retry_options=retry_options)
+# One retrying client (and its pooled connections) is shared by every call
+_retry_client = None
+
+def get_retry_client(retries=5, base_delay=1, max_delay=16, timeout=10):
+    global _retry_client
+    if _retry_client is None:
+        retry_options = JitterRetry(attempts=retries, start_timeout=base_delay, max_timeout=max_delay)
+        session = ClientSession(timeout=ClientTimeout(total=timeout))
+        _retry_client = RetryClient(client_session=session, raise_for_status=False, retry_options=retry_options)
+    return _retry_client
+
+async def close_retry_client():
+    global _retry_client
+    if _retry_client is not None:
+        await _retry_client.close()
+        _retry_client = None
 
 async def fetch_with_retries(url, headers=None, json_data=None):
-    async with get_retry_client() as client:
-        async with client.post(url, headers=headers, json=json_data) as response:
-            return await response.json()
+    client = get_retry_client()
+    async with client.post(url, headers=headers, json=json_data) as response:
+        response.raise_for_status()
+        return await response.json()